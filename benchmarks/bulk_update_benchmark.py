@@ -0,0 +1,119 @@
+"""
+Benchmark: bulk order endpoints vs. the per-request loop.
+
+Seeds N orders into a dedicated database, then moves all of them to a new
+status twice: once with one PUT /orders/{id} per order (the loop clients
+used before the bulk endpoints existed) and once with a single
+POST /orders/bulk/status. Deletes are compared the same way
+(DELETE /orders/{id} per order vs. POST /orders/bulk/delete). Requests go
+through the app in-process with httpx's ASGI transport, so the numbers
+include routing and validation but no network.
+
+Requires a local mongod (MONGO_URI, default mongodb://localhost:27017/).
+
+    python -m benchmarks.bulk_update_benchmark --orders 5000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+os.environ.setdefault("MONGO_DB_NAME", "bulk_update_benchmark")
+
+
+def make_order(i):
+    return {
+        "order_id": f"BULK-{i:06d}",
+        "customer_name": f"Customer {i}",
+        "customer_email": f"customer{i}@example.com",
+        "item_name": "Laptop",
+        "price": 999.99,
+        "qty": 1 + i % 5,
+        "sku": "SKU-0001",
+        "managed_by": f"manager{i % 20}@example.com",
+        "status": "Pending",
+        "created_date": datetime.now(timezone.utc),
+    }
+
+
+async def seed(order_collection, orders):
+    await order_collection.delete_many({})
+    batch = [make_order(i) for i in range(orders)]
+    for start in range(0, len(batch), 10000):
+        await order_collection.insert_many(batch[start:start + 10000], ordered=False)
+    return [order["order_id"] for order in batch]
+
+
+async def run_loop(request_fn, order_ids, concurrency):
+    """Issue one request per order from `concurrency` workers; returns (seconds, failures)."""
+    queue = list(order_ids)
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        while queue:
+            response = await request_fn(queue.pop())
+            if response.status_code >= 400:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, failures
+
+
+async def run(orders, concurrency):
+    from database import order_collection
+    from main import app
+    from utils.indexes import apply_indexes
+
+    await apply_indexes(["orders"])
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        results = {}
+
+        # Status transitions
+        order_ids = await seed(order_collection, orders)
+
+        async def put_status(order_id):
+            body = {**make_order(int(order_id.split("-")[1])), "status": "Shipped"}
+            body.pop("created_date")
+            return await client.put(f"/orders/{order_id}", json=body)
+
+        results["status: per-request PUT"] = await run_loop(put_status, order_ids, concurrency)
+        order_ids = await seed(order_collection, orders)
+        start = time.perf_counter()
+        response = await client.post("/orders/bulk/status", json={"order_ids": order_ids, "status": "Shipped"})
+        results["status: bulk endpoint"] = (time.perf_counter() - start,
+                                            orders - response.json()["summary"].get("updated", 0))
+
+        # Deletes
+        order_ids = await seed(order_collection, orders)
+        results["delete: per-request DELETE"] = await run_loop(
+            lambda order_id: client.delete(f"/orders/{order_id}"), order_ids, concurrency)
+        order_ids = await seed(order_collection, orders)
+        start = time.perf_counter()
+        response = await client.post("/orders/bulk/delete", json={"order_ids": order_ids})
+        results["delete: bulk endpoint"] = (time.perf_counter() - start,
+                                            orders - response.json()["summary"].get("deleted", 0))
+
+    await order_collection.drop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bulk order endpoints with per-request loops")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent requests in the per-request loop")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.orders, args.concurrency))
+    print(f"{args.orders} orders, loop concurrency {args.concurrency}")
+    for name, (seconds, failures) in results.items():
+        print(f"{name:>28}: {seconds:8.3f}s  {args.orders / seconds:>10.0f} orders/s  failures {failures}")
+
+
+if __name__ == "__main__":
+    main()
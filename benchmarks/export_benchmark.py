@@ -0,0 +1,99 @@
+"""
+Benchmark for the streaming /export endpoint.
+
+Seeds a throwaway database with N orders and measures, for each size, the
+time-to-first-byte, total export time and the peak RSS of the exporting process.
+Each size runs in its own subprocess so the peak RSS numbers are independent.
+
+Requires a local mongod (MONGO_URI, default mongodb://localhost:27017/).
+
+    python -m benchmarks.export_benchmark --sizes 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCH_DB_NAME = "export_benchmark"
+os.environ.setdefault("MONGO_DB_NAME", BENCH_DB_NAME)
+
+from database import order_collection  # noqa: E402
+from utils.export_csv import stream_orders_csv, EXPORT_BATCH_SIZE  # noqa: E402
+
+
+def make_order(i):
+    """Build a realistic-looking order document."""
+    return {
+        "order_id": f"ORD-{i:06X}",
+        "customer_name": f"Customer {i}",
+        "customer_email": f"customer{i}@example.com",
+        "item_name": random.choice(["Laptop", "Monitor", "Keyboard", "Mouse", "Dock"]),
+        "price": round(random.uniform(5, 2000), 2),
+        "qty": random.randint(1, 10),
+        "sku": f"SKU-{i % 500:04d}",
+        "managed_by": f"manager{i % 20}@example.com",
+        "added_by": f"employee{i % 100}@example.com",
+        "status": random.choice(["Pending", "Shipped", "Delivered", "Canceled"]),
+        "created_date": datetime.now(timezone.utc),
+    }
+
+
+async def seed(size):
+    """Make sure the benchmark collection holds exactly `size` orders."""
+    if await order_collection.count_documents({}) == size:
+        return
+    await order_collection.delete_many({})
+    batch = []
+    for i in range(size):
+        batch.append(make_order(i))
+        if len(batch) == 10000:
+            await order_collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await order_collection.insert_many(batch, ordered=False)
+
+
+async def run_export(batch_size):
+    """Drain the export generator and report timings plus peak RSS."""
+    start = time.perf_counter()
+    first_byte = None
+    total_bytes = 0
+    async for chunk in stream_orders_csv(batch_size=batch_size):
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        total_bytes += len(chunk)
+    total = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{first_byte * 1000:.1f} {total:.2f} {peak_rss_mb:.1f} {total_bytes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming order export")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        asyncio.run(run_export(args.batch_size))
+        return
+
+    print(f"{'orders':>10} {'ttfb (ms)':>10} {'total (s)':>10} {'peak RSS (MB)':>14} {'bytes':>12}")
+    for size in args.sizes:
+        asyncio.run(seed(size))
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.export_benchmark", "--run", "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+        ttfb, total, rss, total_bytes = output
+        print(f"{size:>10} {ttfb:>10} {total:>10} {rss:>14} {total_bytes:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark for the process-pool invoice renderer.
+
+Renders N synthetic invoices (in memory, nothing is stored) with 1 worker and
+with N workers and reports invoices per second for each pool size.
+No database is needed.
+
+    python -m benchmarks.invoice_benchmark --invoices 5000 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.invoices import render_invoices, _init_worker
+
+
+def make_order(i):
+    return {
+        "order_id": f"ORD-{i:06X}",
+        "customer_name": f"Customer {i}",
+        "customer_email": f"customer{i}@example.com",
+        "item_name": "Laptop",
+        "qty": i % 10 + 1,
+    }
+
+
+async def run(orders, workers, chunk_size):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        # Warm the pool up so process start-up is not counted
+        await asyncio.gather(*(render_invoices(orders[:1], executor) for _ in range(workers)))
+        start = time.perf_counter()
+        chunks = [orders[i:i + chunk_size] for i in range(0, len(orders), chunk_size)]
+        results = await asyncio.gather(*(render_invoices(chunk, executor) for chunk in chunks))
+        elapsed = time.perf_counter() - start
+    failed = sum(1 for chunk in results for _, _, error in chunk if error)
+    return elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the invoice renderer")
+    parser.add_argument("--invoices", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--chunk-size", type=int, default=50)
+    args = parser.parse_args()
+
+    orders = [make_order(i) for i in range(args.invoices)]
+    print(f"{'workers':>8} {'invoices/s':>12} {'elapsed (s)':>12} {'failed':>7}")
+    for workers in args.workers:
+        elapsed, failed = asyncio.run(run(orders, workers, args.chunk_size))
+        print(f"{workers:>8} {args.invoices / elapsed:>12.1f} {elapsed:>12.2f} {failed:>7}")
+
+
+if __name__ == "__main__":
+    main()
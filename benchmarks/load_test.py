@@ -0,0 +1,359 @@
+"""
+Reproducible load test for the FastAPI app.
+
+Starts the app from main.py with uvicorn against a local mongod (using a
+dedicated database), points SMTP at a local aiosmtpd stand-in so invoice
+emails are accepted and discarded, seeds realistic data, then drives
+concurrent load at the key routes and reports throughput and p50/p95/p99
+latency per scenario. Responses turned away by admission control (429/503)
+are counted separately from errors. After the upload_csv scenario, the
+queued imports are polled until they finish and their rows/s is reported
+as the "import" result. Results are written as JSON (with the git commit) so
+runs can be compared between commits with --compare.
+
+Requires a local mongod, uvicorn, httpx and aiosmtpd.
+
+    python -m benchmarks.load_test --orders 100000 --requests 2000 --concurrency 50
+    python -m benchmarks.load_test --compare bench_results/old.json bench_results/new.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+from aiosmtpd.controller import Controller
+from motor.motor_asyncio import AsyncIOMotorClient
+
+LOAD_TEST_DB = "load_test"
+LOGIN_EMAIL = "loadtest@company.com"
+LOGIN_PASSWORD = "loadtest123"
+ITEMS = [("Laptop", "SKU-0001", "999.99"), ("Monitor", "SKU-0002", "199.99"), ("Keyboard", "SKU-0003", "49.99"),
+         ("Mouse", "SKU-0004", "19.99"), ("Dock", "SKU-0005", "149.99")]
+STATUSES = ["Pending", "Shipped", "Delivered", "Canceled"]
+
+
+class DiscardHandler:
+    """aiosmtpd handler that accepts every message and drops it."""
+
+    async def handle_DATA(self, server, session, envelope):
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_order(i):
+    item_name, sku, price = random.choice(ITEMS)
+    return {
+        "order_id": f"ORD-{i:06X}",
+        "customer_name": f"Customer {i}",
+        "customer_email": f"customer{i}@example.com",
+        "item_name": item_name,
+        "price": float(price),
+        "qty": random.randint(1, 10),
+        "sku": sku,
+        "managed_by": f"manager{i % 20}@example.com",
+        "added_by": f"employee{i % 100}@example.com",
+        "status": random.choice(STATUSES),
+        "created_date": datetime.now(timezone.utc),
+        "invoice_status": "sent",
+    }
+
+
+async def seed(mongo_uri, orders):
+    """Reset the load-test database with a login user, the item catalog and `orders` orders."""
+    client = AsyncIOMotorClient(mongo_uri)
+    db = client[LOAD_TEST_DB]
+    for name in ("orders", "items", "employees", "registered_users", "jobs"):
+        await db[name].drop()
+    await db.employees.insert_one({"name": "Load Test", "company_email": LOGIN_EMAIL,
+                                   "password": LOGIN_PASSWORD, "usertype": "admin"})
+    await db["items"].insert_many([{"item_name": name, "sku": sku, "price": price, "item_inventory": "100"}
+                                   for name, sku, price in ITEMS])
+    batch = []
+    for i in range(orders):
+        batch.append(make_order(i))
+        if len(batch) == 10000:
+            await db.orders.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.orders.insert_many(batch, ordered=False)
+    client.close()
+
+
+UPLOAD_HEADER = b"order_id,customer_name,customer_email,item_name,price,qty,status\n"
+
+
+def make_upload_rows(rows):
+    out = io.StringIO()
+    for _ in range(rows - 1):
+        item_name, _, price = random.choice(ITEMS)
+        out.write(f",Customer,customer@example.com,{item_name},{price},{random.randint(1, 5)},Pending\n")
+    return out.getvalue().encode()
+
+
+def scenarios(upload_rows, upload_jobs):
+    """
+    Scenario name -> coroutine function issuing one request with the given client.
+    The IDs of the import jobs queued by upload_csv are appended to `upload_jobs`.
+    """
+    upload_rows_body = make_upload_rows(upload_rows)
+    upload_count = [0]
+
+    async def login(client):
+        return await client.post("/login", json={"company_email": LOGIN_EMAIL, "password": LOGIN_PASSWORD})
+
+    async def create_order(client):
+        item_name, _, _ = random.choice(ITEMS)
+        return await client.post("/orders/create_order", json={
+            "customer_name": "Load Test", "customer_email": "customer@example.com",
+            "item_name": item_name, "qty": random.randint(1, 5), "price": None,
+        })
+
+    async def list_orders(client):
+        return await client.get("/orders/list_orders", params={
+            "page": random.randint(1, 50), "limit": 20, "status": random.choice(STATUSES),
+        })
+
+    async def get_all_orders(client):
+        return await client.get("/orders/get_all_orders", params={
+            "status": random.choice(STATUSES), "managed_by": f"manager{random.randint(0, 19)}@example.com",
+        })
+
+    async def export(client):
+        total = 0
+        async with client.stream("GET", "/export") as response:
+            async for chunk in response.aiter_bytes():
+                total += len(chunk)
+        return response
+
+    async def upload_csv(client):
+        # A unique first row per upload, so the import is not deduplicated against a queued one by digest
+        upload_count[0] += 1
+        first_row = f",Upload {upload_count[0]} {time.time_ns()},upload@example.com,Laptop,999.99,1,Pending\n"
+        body = UPLOAD_HEADER + first_row.encode() + upload_rows_body
+        response = await client.post("/upload_csv", files={"file": ("orders.csv", body, "text/csv")})
+        if response.status_code == 202:
+            upload_jobs.append(response.json()["job_id"])
+        return response
+
+    return {
+        "login": login,
+        "create_order": create_order,
+        "list_orders": list_orders,
+        "get_all_orders": get_all_orders,
+        "export": export,
+        "upload_csv": upload_csv,
+    }
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(base_url, request_fn, requests, concurrency):
+    """Issue `requests` requests from `concurrency` workers and summarise the latencies."""
+    latencies = []
+    errors = 0
+    rejected = {429: 0, 503: 0}  # Admission control: queue full / queued too long
+    remaining = [requests]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                start = time.perf_counter()
+                try:
+                    response = await request_fn(client)
+                    if response.status_code in rejected:
+                        rejected[response.status_code] += 1
+                    elif response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rejected_429": rejected[429],
+        "rejected_503": rejected[503],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def wait_for_imports(base_url, job_ids, started, timeout):
+    """
+    Poll GET /upload_csv/{job_id} until every queued import is done or failed, and report the
+    import throughput from the start of the upload phase to the last completion.
+    """
+    finished = {}
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        pending = list(job_ids)
+        while pending and time.perf_counter() < deadline:
+            for job_id in list(pending):
+                progress = (await client.get(f"/upload_csv/{job_id}")).json()
+                if progress["state"] in ("done", "failed"):
+                    finished[job_id] = progress
+                    pending.remove(job_id)
+            if pending:
+                await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - started
+
+    rows = sum(progress["rows_processed"] for progress in finished.values())
+    job_rates = sorted(progress["rows_per_second"] for progress in finished.values() if progress["rows_per_second"])
+    return {
+        "jobs": len(job_ids),
+        "completed": sum(progress["state"] == "done" for progress in finished.values()),
+        "failed": sum(progress["state"] == "failed" for progress in finished.values()),
+        "timed_out": len(job_ids) - len(finished),
+        "rows": rows,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1),
+        "p50_job_rows_per_second": percentile(job_rates, 50),
+    }
+
+
+def start_app(port, mongo_uri, smtp_port):
+    env = dict(os.environ, MONGO_URI=mongo_uri, MONGO_DB_NAME=LOAD_TEST_DB, SMTP_HOST="127.0.0.1",
+               SMTP_PORT=str(smtp_port), SMTP_STARTTLS="0", SMTP_PASSWORD="", LOG_LEVEL="WARNING")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/login", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("The app did not start within 30 seconds")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(old_path, new_path):
+    """Print the per-scenario change between two result files."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['commit']} -> {new['commit']}")
+    print(f"{'scenario':>15} {'rps':>16} {'p50 ms':>18} {'p99 ms':>18}")
+    for name, result in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if not before:
+            continue
+        if "throughput_rps" not in result:
+            print(f"{name:>15} {before['rows_per_second']:>7} -> {result['rows_per_second']:<7} rows/s")
+            continue
+        print(f"{name:>15} {before['throughput_rps']:>7} -> {result['throughput_rps']:<7} "
+              f"{before['p50_ms']:>8} -> {result['p50_ms']:<8} {before['p99_ms']:>8} -> {result['p99_ms']:<8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the FastAPI app")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--orders", type=int, default=100000, help="orders seeded before the run")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--heavy-requests", type=int, default=20, help="requests for export and upload_csv")
+    parser.add_argument("--heavy-concurrency", type=int, default=4)
+    parser.add_argument("--upload-rows", type=int, default=5000)
+    parser.add_argument("--import-timeout", type=float, default=600, help="seconds to wait for queued imports")
+    parser.add_argument("--scenarios", nargs="+", default=None, help="subset of scenarios to run")
+    parser.add_argument("--output", default=None, help="result file (default: bench_results/<commit>-<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    random.seed(42)
+    asyncio.run(seed(args.mongo_uri, args.orders))
+
+    smtp_port = free_port()
+    smtp = Controller(DiscardHandler(), hostname="127.0.0.1", port=smtp_port)
+    smtp.start()
+    port = free_port()
+    app = start_app(port, args.mongo_uri, smtp_port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    results = {}
+    upload_jobs = []
+    try:
+        for name, request_fn in scenarios(args.upload_rows, upload_jobs).items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+            heavy = name in ("export", "upload_csv")
+            requests = args.heavy_requests if heavy else args.requests
+            concurrency = args.heavy_concurrency if heavy else args.concurrency
+            started = time.perf_counter()
+            results[name] = asyncio.run(run_scenario(base_url, request_fn, requests, concurrency))
+            r = results[name]
+            print(f"{name:>15}: {r['throughput_rps']:>8} req/s  p50 {r['p50_ms']:>8} ms  "
+                  f"p95 {r['p95_ms']:>8} ms  p99 {r['p99_ms']:>8} ms  errors {r['errors']}  "
+                  f"rejected 429 {r['rejected_429']} / 503 {r['rejected_503']}")
+            if name == "upload_csv":
+                results["import"] = asyncio.run(wait_for_imports(base_url, upload_jobs, started, args.import_timeout))
+                r = results["import"]
+                print(f"{'import':>15}: {r['rows_per_second']:>8} rows/s  {r['rows']} rows in {r['elapsed_s']} s  "
+                      f"jobs {r['completed']} done / {r['failed']} failed / {r['timed_out']} timed out")
+    finally:
+        app.terminate()
+        app.wait(timeout=30)
+        smtp.stop()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"orders": args.orders, "requests": args.requests, "concurrency": args.concurrency,
+                   "heavy_requests": args.heavy_requests, "heavy_concurrency": args.heavy_concurrency,
+                   "upload_rows": args.upload_rows, "import_timeout": args.import_timeout},
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(
+        "bench_results", f"{report['commit'] or 'unknown'}-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
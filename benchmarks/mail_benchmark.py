@@ -0,0 +1,73 @@
+"""
+Benchmark for the pooled SMTP mailer against a local SMTP stand-in.
+
+Starts an aiosmtpd server on localhost that accepts and discards every
+message, then pushes N invoice-sized emails through the mailer and reports
+throughput, batch and connection counters. Compare pool sizes to see how much
+of the cost is connection setup.
+
+Requires aiosmtpd (pip install aiosmtpd).
+
+    python -m benchmarks.mail_benchmark --messages 2000 --pool-sizes 1 2 4
+"""
+import argparse
+import asyncio
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from aiosmtpd.controller import Controller
+
+from utils.mailer import Mailer
+
+
+class DiscardHandler:
+    """aiosmtpd handler that accepts every message and drops it."""
+
+    async def handle_DATA(self, server, session, envelope):
+        return "250 Message accepted for delivery"
+
+
+def make_message(i):
+    message = MIMEMultipart()
+    message["From"] = "invoices@example.com"
+    message["To"] = f"customer{i}@example.com"
+    message["Subject"] = f"Invoice for Order ORD-{i:06X}"
+    message.attach(MIMEText("Please find your invoice attached.\n" + ("x" * 76 + "\n") * 260, "plain"))
+    return message
+
+
+async def run(port, messages, pool_size, batch_size):
+    mailer = Mailer(host="127.0.0.1", port=port, sender="invoices@example.com", password="",
+                    starttls=False, pool_size=pool_size, batch_size=batch_size)
+    mailer.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(mailer.send(make_message(i)) for i in range(messages)))
+    elapsed = time.perf_counter() - start
+    stats = mailer.stats()
+    await mailer.stop()
+    return elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pooled SMTP mailer")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    controller = Controller(DiscardHandler(), hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        print(f"{'pool':>5} {'msgs/s':>10} {'elapsed (s)':>12} {'batches':>8} {'connections':>12} {'failed':>7}")
+        for pool_size in args.pool_sizes:
+            elapsed, stats = asyncio.run(run(args.port, args.messages, pool_size, args.batch_size))
+            print(f"{pool_size:>5} {args.messages / elapsed:>10.1f} {elapsed:>12.2f} {stats['batches']:>8} "
+                  f"{stats['connections_opened']:>12} {stats['messages_failed']:>7}")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
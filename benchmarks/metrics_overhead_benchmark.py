@@ -0,0 +1,67 @@
+"""
+Per-request overhead of the metrics middleware.
+
+Drives a minimal FastAPI app directly through ASGI (no network, no server)
+with and without MetricsMiddleware and reports the added cost per request.
+
+    python -m benchmarks.metrics_overhead_benchmark --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+
+from utils.metrics import MetricsMiddleware
+
+
+def make_app(with_metrics):
+    app = FastAPI()
+
+    @app.get("/orders/{order_id}")
+    async def get_order(order_id: str):
+        return {"order_id": order_id}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def drive(app, requests):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/orders/ORD-{i:06X}", "raw_path": b"", "query_string": b"",
+            "root_path": "", "headers": [], "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the metrics middleware overhead")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    plain_app, metrics_app = make_app(False), make_app(True)
+    # Alternate the runs and keep the best of each to filter out warm-up and noise
+    baseline = instrumented = float("inf")
+    for _ in range(args.rounds):
+        baseline = min(baseline, asyncio.run(drive(plain_app, args.requests)))
+        instrumented = min(instrumented, asyncio.run(drive(metrics_app, args.requests)))
+    print(f"without metrics: {baseline * 1e6:8.1f} us/request")
+    print(f"with metrics:    {instrumented * 1e6:8.1f} us/request")
+    print(f"overhead:        {(instrumented - baseline) * 1e6:8.1f} us/request "
+          f"({(instrumented / baseline - 1) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
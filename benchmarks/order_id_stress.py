@@ -0,0 +1,106 @@
+"""
+Concurrency stress test for order ID allocation.
+
+Inserts N orders from C concurrent tasks, with a configurable share of the
+tasks deliberately reusing an ID that is already taken, and then checks that
+every stored order_id is unique. Every command sent to MongoDB is counted with
+a pymongo CommandListener, so the round trips per order can be compared with
+the previous lookup-then-insert allocator (at least 2 per order).
+
+Requires a local mongod (MONGO_URI, default mongodb://localhost:27017/).
+
+    python -m benchmarks.order_id_stress --orders 50000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+
+from pymongo import monitoring
+
+os.environ.setdefault("MONGO_DB_NAME", "order_id_stress")
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Count the commands sent to the server by name."""
+
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Must be registered before the client in database.py is created
+counter = CommandCounter()
+monitoring.register(counter)
+
+from database import order_collection  # noqa: E402
+from utils.helpers import generate_short_order_id, insert_order  # noqa: E402
+from utils.indexes import apply_indexes  # noqa: E402
+
+
+async def worker(queue, taken_ids, collide_rate, stats):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        order = {"customer_email": "stress@example.com", "item_name": "Widget", "qty": 1, "status": "Pending"}
+        # Force a collision on the first attempt for a share of the orders
+        if taken_ids and random.random() < collide_rate:
+            order["order_id"] = random.choice(taken_ids)
+            stats["forced_collisions"] += 1
+        else:
+            order["order_id"] = generate_short_order_id()
+        taken_ids.append(await insert_order(order, regenerate_id=True))
+
+
+async def run(orders, concurrency, collide_rate):
+    await order_collection.drop()
+    await apply_indexes(["orders"])
+    counter.commands.clear()
+
+    queue = asyncio.Queue()
+    for i in range(orders):
+        queue.put_nowait(i)
+    taken_ids = []
+    stats = Counter()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(queue, taken_ids, collide_rate, stats) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    commands = dict(counter.commands)
+
+    stored = await order_collection.count_documents({})
+    distinct = len(await order_collection.distinct("order_id"))
+    print(f"orders inserted:      {stored}")
+    print(f"distinct order_ids:   {distinct}")
+    print(f"collisions in store:  {stored - distinct}")
+    print(f"forced collisions:    {stats['forced_collisions']}")
+    print(f"server commands:      {commands}")
+    print(f"round trips / order:  {sum(commands.values()) / orders:.3f} (previous allocator: >= 2)")
+    print(f"elapsed:              {elapsed:.2f}s ({orders / elapsed:.0f} orders/s)")
+    assert stored == orders and distinct == orders, "duplicate or missing order IDs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test order ID allocation")
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--collide-rate", type=float, default=0.01,
+                        help="share of inserts that start from an already used ID")
+    args = parser.parse_args()
+    asyncio.run(run(args.orders, args.concurrency, args.collide_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark: order search and item autocomplete latency.
+
+Seeds N orders (default 1,000,000) with their normalized search fields into a
+dedicated database, builds the indexes, then times repeated queries:
+
+- text search (GET /orders/search?mode=text) over the weighted text index
+- prefix search (GET /orders/search?mode=prefix) over the search.* indexes
+- item autocomplete (GET /orders/autocomplete/items) from the in-memory catalog
+- for comparison, a case-insensitive $regex over the raw fields, which
+  is what a search without these indexes has to do (a collection scan)
+
+The search functions are called directly so the numbers are query latency
+only; the response cache is not involved.
+
+The p50/p95/p99 of every measurement are printed and written as JSON (with
+the git commit) to bench_results/, like the load test's results.
+
+Requires a local mongod (MONGO_URI, default mongodb://localhost:27017/).
+
+    python -m benchmarks.search_benchmark --orders 1000000 --queries 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("MONGO_DB_NAME", "search_benchmark")
+
+FIRST_NAMES = ["Ana", "Bjørn", "Chloé", "David", "Elif", "Farah", "Gustavo", "Hana", "Ivan", "José",
+               "Kenji", "Léa", "Mateo", "Nadia", "Olivia", "Priya", "Quentin", "Renée", "Sofia", "Tomás"]
+LAST_NAMES = ["Smith", "García", "Müller", "Nguyen", "O'Brien", "Rossi", "Søren", "Tanaka", "Dubois", "Kowalski"]
+ITEMS = ["Laptop", "Laptop Stand", "Desk Lamp", "Monitor", "Mechanical Keyboard", "Mouse", "USB-C Hub",
+         "Webcam", "Headset", "Office Chair", "Standing Desk", "Docking Station"]
+
+
+def make_order(i):
+    from utils.search import search_document
+
+    first, last = FIRST_NAMES[i % len(FIRST_NAMES)], LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    item = ITEMS[i % len(ITEMS)]
+    order = {
+        "order_id": f"SRCH-{i:07d}",
+        "customer_name": f"{first} {last} {i % 997}",
+        "customer_email": f"{first.lower()}.{i}@example.com",
+        "item_name": item,
+        "price": 99.99,
+        "qty": 1 + i % 5,
+        "sku": f"SKU-{i % 5000:05d}",
+        "managed_by": f"manager{i % 20}@example.com",
+        "status": "Pending",
+        "created_date": datetime.now(timezone.utc),
+    }
+    order["search"] = search_document(order)
+    return order
+
+
+async def seed(order_collection, orders):
+    await order_collection.drop()
+    for start in range(0, orders, 10000):
+        batch = [make_order(i) for i in range(start, min(start + 10000, orders))]
+        await order_collection.insert_many(batch, ordered=False)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")  # Never above the max sample
+    return {"p50": quantiles[49], "p95": quantiles[94], "p99": quantiles[98], "max": samples[-1]}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+async def timed(fn, terms):
+    """Run fn(term) once per term, returning the latencies in milliseconds."""
+    samples = []
+    for term in terms:
+        start = time.perf_counter()
+        await fn(term)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def run(orders, queries, skip_seed):
+    from database import order_collection, items_collection
+    from utils.catalog import catalog
+    from utils.indexes import apply_indexes
+    from utils.search import text_search, prefix_search
+
+    if not skip_seed:
+        start = time.perf_counter()
+        await seed(order_collection, orders)
+        print(f"seeded {orders} orders in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    await apply_indexes(["orders"])
+    print(f"built indexes in {time.perf_counter() - start:.1f}s")
+
+    await items_collection.drop()
+    await items_collection.insert_many([
+        {"item_id": i, "item_name": f"{ITEMS[i % len(ITEMS)]} {i}", "sku": f"SKU-{i:05d}",
+         "item_inventory": 10, "price": 9.99}
+        for i in range(5000)
+    ])
+    await catalog.refresh()
+
+    rng = random.Random(42)
+    words = [name for name in FIRST_NAMES + LAST_NAMES + ITEMS if " " not in name]
+    text_terms = [rng.choice(words) for _ in range(queries)]
+    prefix_terms = [rng.choice(FIRST_NAMES + ITEMS)[:rng.randint(2, 4)] for _ in range(queries)]
+    sku_terms = [f"sku-{rng.randint(0, 4999):05d}"[:rng.randint(5, 8)] for _ in range(queries)]
+
+    async def regex_scan(term):
+        pattern = {"$regex": re.escape(term), "$options": "i"}
+        fields = ("sku", "customer_email", "customer_name", "item_name")
+        cursor = order_collection.find({"$or": [{field: pattern} for field in fields]}).limit(20)
+        return await cursor.to_list(length=20)
+
+    results = {
+        "text search": await timed(lambda term: text_search(term), text_terms),
+        "text search, page 5": await timed(lambda term: text_search(term, page=5), text_terms),
+        "prefix search": await timed(lambda term: prefix_search(term), prefix_terms),
+        "prefix search, SKU": await timed(lambda term: prefix_search(term), sku_terms),
+        "item autocomplete": await timed(lambda term: catalog.autocomplete(term), prefix_terms + sku_terms),
+        # The scan is slow enough that a handful of queries shows the difference
+        "unindexed $regex scan": await timed(regex_scan, prefix_terms[:max(queries // 20, 5)]),
+    }
+    # The orders are left in place for --skip-seed runs
+    await items_collection.drop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure order search and item autocomplete latency")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200, help="queries per measurement")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the orders already in the database")
+    parser.add_argument("--output", default=None,
+                        help="result file (default: bench_results/search-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.orders, args.queries, args.skip_seed))
+    print(f"{args.orders} orders, latency in ms")
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"orders": args.orders, "queries": args.queries},
+        "latency_ms": {},
+    }
+    for name, samples in results.items():
+        stats = percentiles(samples)
+        report["latency_ms"][name] = {key: round(value, 2) for key, value in stats.items()}
+        print(f"{name:>24}: " + "  ".join(f"{key} {value:8.2f}" for key, value in stats.items()))
+
+    output = args.output or os.path.join(
+        "bench_results", f"search-{report['commit'] or 'unknown'}-{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
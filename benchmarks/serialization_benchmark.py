@@ -0,0 +1,86 @@
+"""
+Microbenchmark of order list serialization.
+
+Compares, for 1k/10k/100k order documents as they come back from Motor
+(ObjectId _id, datetime dates):
+  - legacy: serialize_order on every document, then FastAPI's jsonable_encoder
+    and the default JSONResponse rendering
+  - fast:   FastJSONResponse encoding the raw documents with orjson
+
+No database is needed.
+
+    python -m benchmarks.serialization_benchmark --sizes 1000 10000 100000
+"""
+import argparse
+import copy
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils.helpers import serialize_order
+from utils.serializers import FastJSONResponse
+
+
+def make_orders(size):
+    base = datetime(2025, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "order_id": f"ORD-{i:06X}",
+            "customer_name": f"Customer {i}",
+            "customer_email": f"customer{i}@example.com",
+            "item_name": "Laptop",
+            "price": 999.99,
+            "qty": i % 10 + 1,
+            "sku": f"SKU-{i % 500:04d}",
+            "managed_by": f"manager{i % 20}@example.com",
+            "added_by": f"employee{i % 100}@example.com",
+            "status": "Pending",
+            "created_date": base + timedelta(seconds=i),
+            "modified_date": base + timedelta(seconds=2 * i),
+            "invoice_status": "sent",
+        }
+        for i in range(size)
+    ]
+
+
+def legacy(orders):
+    serialized = [serialize_order(order) for order in orders]
+    return JSONResponse(jsonable_encoder({"orders": serialized})).body
+
+
+def fast(orders):
+    return FastJSONResponse({"orders": orders}).body
+
+
+def timed(fn, orders, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        # serialize_order mutates documents, so each run gets fresh copies
+        docs = copy.deepcopy(orders)
+        start = time.perf_counter()
+        body = fn(docs)
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark order list serialization")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} {'legacy (ms)':>12} {'fast (ms)':>10} {'speedup':>8} {'bytes':>10}")
+    for size in args.sizes:
+        orders = make_orders(size)
+        legacy_time, _ = timed(legacy, orders, args.repeat)
+        fast_time, size_bytes = timed(fast, orders, args.repeat)
+        print(f"{size:>8} {legacy_time * 1000:>12.1f} {fast_time * 1000:>10.1f} "
+              f"{legacy_time / fast_time:>7.1f}x {size_bytes:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,118 @@
 
 
+import os
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.collection import Collection
 
-mongo_uri = "mongodb://localhost:27017/"
-db_name = "MyDataBase"
+from utils.metrics import mongo_command_listener, mongo_pool_listener
+from utils.response_cache import collection_versions
+
+mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+db_name = os.getenv("MONGO_DB_NAME", "MyDataBase")
+
+# Connection pool sizing, per process (each uvicorn worker has its own pool)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+# How long an operation waits for a free pooled connection before failing (0 = wait indefinitely)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))
+
+# How long an operation waits for a suitable server (e.g. during an election) before failing
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+# Comma-separated wire compressors offered to the server, e.g. "zstd,snappy,zlib" (empty = none).
+# zstd and snappy need the zstandard / python-snappy packages; zlib is always available.
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+
+_client = None
+
+
+def client_options():
+    """Keyword arguments for the MongoDB client, built from the configuration above."""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        # The listeners record command latency and pool checkout statistics for /metrics and /healthz,
+        # and bump the collection versions that invalidate cached list responses
+        "event_listeners": [mongo_command_listener, mongo_pool_listener, collection_versions],
+    }
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+def connect():
+    """Create the shared client. Called from the app lifespan, once the event loop is running."""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(mongo_uri, **client_options())
+    return _client
+
+
+def close():
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def get_client():
+    """The shared client, created on first use outside the app (CLIs, benchmarks)."""
+    return _client if _client is not None else connect()
+
+
+def get_database():
+    return get_client()[db_name]
+
+
+class LazyDatabase:
+    """Stand-in for the database that resolves against the current client on each use."""
+
+    def __getitem__(self, name):
+        return get_database()[name]
+
+    def __getattr__(self, name):
+        return getattr(get_database(), name)
+
+
+class LazyCollection:
+    """
+    Stand-in for a collection that resolves against the current client on each use,
+    so modules can import collections at import time while the client is owned by the lifespan.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_database()[self.name], attr)
+
+    def __getitem__(self, name):
+        return get_database()[self.name][name]
+
+
+db = LazyDatabase()
+
+register_collection = LazyCollection("registered_users")
+
+employee_collection = LazyCollection("employees")
+
+order_collection = LazyCollection("orders")
 
-client = AsyncIOMotorClient('mongodb://localhost:27017')
-db = client[db_name]
+items_collection = LazyCollection("items")
 
-register_collection = db["registered_users"]
+jobs_collection = LazyCollection("jobs")
 
-employee_collection = db["employees"]
+rollup_collection = LazyCollection("order_rollups")
 
-order_collection = db["orders"]
+tombstone_collection = LazyCollection("order_tombstones")
 
-items_collection = db["items"]
+sync_cursor_collection = LazyCollection("sync_cursors")
 
 
 
@@ -1,6 +1,8 @@
 
 import logging
+import os
 import smtplib
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -10,17 +12,75 @@ import requests
 from bson import ObjectId
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 
 
+import database
 from database import register_collection, employee_collection, order_collection
 from models.users import SignUp
 
-from routes import orders, users, auth
-from utils import export_csv, import_csv, helpers
+from routes import orders, users, auth, admin, analytics
+from utils import export_csv, delta_export, import_csv, imports, helpers, jobs, invoices, indexes
+from utils.mailer import mailer
+from utils.catalog import catalog
+from utils.directory import user_search_document
+from utils.recaptcha import verifier
+from utils.logger import setup_logging, stop_logging, get_logger, log_fields, RequestIdMiddleware
+from utils.metrics import MetricsMiddleware, render_metrics, mongo_pool_listener
+from utils.admission import AdmissionMiddleware
+from utils.response_cache import CacheVersionMiddleware, collection_versions
 from utils.export_csv import export_orders
 
-app = FastAPI()
+# Send all logging through the queue-backed JSON logger before anything else logs
+setup_logging()
+logger = get_logger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the MongoDB client (pool size, timeouts and compression come from the environment)
+    database.connect()
+
+    # Publish this worker's writes to the shared collection versions that invalidate cached responses
+    collection_versions.start_flushing()
+
+    # Create the registered indexes (unique order_id, list query and lookup indexes)
+    await indexes.apply_indexes()
+
+    # Start the pooled SMTP mailer and the background job workers (invoice rendering and email delivery)
+    mailer.start()
+    jobs.start_workers()
+
+    # Invalidate the item catalog cache on writes when change streams are available
+    catalog.start_watching()
+    yield
+    await catalog.stop_watching()
+    await verifier.close()
+    await jobs.stop_workers()
+    await mailer.stop()
+    invoices.shutdown_executor()
+    imports.shutdown_executor()
+    await collection_versions.stop_flushing()
+    database.close()
+    stop_logging()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Hold expensive route classes (exports, imports, bulk work) to per-class concurrency limits and
+# bounded queues, so they cannot starve interactive routes of workers and MongoDB connections
+app.add_middleware(AdmissionMiddleware)
+
+# Publish the collection writes of each request before its response is sent, so other workers
+# stop serving cached responses built before the write
+app.add_middleware(CacheVersionMiddleware)
+
+# Tag every request with an ID that is attached to its log records
+app.add_middleware(RequestIdMiddleware)
+
+# Record per-route request counts, errors and latency
+app.add_middleware(MetricsMiddleware)
 
 # Add SessionMiddleware
 app.add_middleware(SessionMiddleware, secret_key="your_secret_key")
@@ -34,15 +94,69 @@ app.add_middleware(
     allow_methods=["*"],
 )
 
-# Print a start message immediately on startup
-print("Server is starting...", flush=True)
+# Log a start message immediately on startup
+logger.info("Server is starting...")
 
 
 app.include_router(orders.router, prefix="/orders", tags=["Orders"])
 app.include_router(users.router, prefix="", tags=["Users"])
 app.include_router(auth.router, prefix="", tags=["Authentication"])
 app.include_router(export_csv.router, prefix="", tags=["export"])
+app.include_router(delta_export.router, prefix="", tags=["export"])
 app.include_router(import_csv.router, prefix="", tags=["import"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
+app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, MongoDB command and span metrics in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def pool_report():
+    """Connection pool configuration and per-server checkout/wait statistics of this worker process."""
+    return {
+        "pid": os.getpid(),
+        "max_pool_size": database.MONGO_MAX_POOL_SIZE,
+        "min_pool_size": database.MONGO_MIN_POOL_SIZE,
+        "wait_queue_timeout_ms": database.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "server_selection_timeout_ms": database.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "compressors": database.MONGO_COMPRESSORS or None,
+        "pools": mongo_pool_listener.stats(),
+    }
+
+
+@app.get('/healthz')
+async def healthz():
+    """Liveness: the process is serving requests. Does not touch MongoDB."""
+    return {"status": "ok", "mongo_pool": pool_report()}
+
+
+@app.get('/readyz')
+async def readyz():
+    """
+    Readiness: MongoDB answers a ping within the server selection timeout, and every unique
+    index was created (without them duplicate order IDs would be accepted).
+    """
+    try:
+        await database.get_client().admin.command("ping")
+    except Exception as e:
+        logger.warning("Readiness check failed: %s", e)
+        return JSONResponse(status_code=503,
+                            content={"status": "unavailable", "error": str(e), "mongo_pool": pool_report()})
+    missing = indexes.missing_unique_indexes()
+    if missing:
+        return JSONResponse(status_code=503,
+                            content={"status": "unavailable", "error": "unique indexes missing",
+                                     "missing_indexes": missing, "mongo_pool": pool_report()})
+    return {"status": "ready", "mongo_pool": pool_report()}
+
+
+@app.get('/mail_stats')
+async def get_mail_stats():
+    """Throughput and health counters of the pooled SMTP mailer."""
+    return mailer.stats()
 
 
 
@@ -61,14 +175,14 @@ async def post_signup(user: SignUp):
       4. Inserts the user into the database.
       5. Returns a success message with the computed role.
     """
-    print("Received signup request", flush=True)
     try:
-        print("Signup data received:", user.model_dump(), flush=True)
+        # Only the email is logged, never the password or the rest of the payload
+        logger.info("Received signup request", extra=log_fields(email=user.personal_email))
 
         # Check if a user with the given email already exists.
         existing_user = await employee_collection.find_one({"email": user.personal_email})
         if existing_user:
-            print("User already exists with email:", user.email, flush=True)
+            logger.info("User already exists", extra=log_fields(email=user.personal_email))
             raise HTTPException(status_code=400, detail="User already exists")
 
         name = f"{user.firstname} {user.lastname}"
@@ -80,17 +194,18 @@ async def post_signup(user: SignUp):
             "password": user.password,
             "usertype": 'visitor'
         }
+        user_data["search"] = user_search_document("registered", user_data)  # Normalized copies for the directory search
 
 
 
         # Insert the new user into the database.
         await register_collection.insert_one(user_data)
-        print("User inserted successfully:", user_data, flush=True)
+        logger.info("User inserted successfully", extra=log_fields(email=user.personal_email))
 
         return {"message": "You are registered successfully"}
 
     except Exception as e:
-        print("Error during signup:", e, flush=True)
+        logger.error("Error during signup: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -1,9 +1,7 @@
-from pydantic import BaseModel  # Importing Pydantic's BaseModel for data validation and serialization
-from typing import Optional  # Importing Optional for fields that can be None
+from pydantic import BaseModel, Field  # Pydantic's BaseModel for validation and Field for defaults and rules
+from typing import Optional, List, Dict, Any, Literal  # Typing helpers for optional, list and mapping fields
 from datetime import datetime  # Importing datetime to handle date and time fields
 
-from pydantic.v1 import Field  # Importing Field for setting default values and validation rules
-
 # Order class for representing and validating order-related data
 class Order(BaseModel):
     order_id: Optional[str]  # Optional unique identifier for the order
@@ -15,7 +13,7 @@ class Order(BaseModel):
     sku: Optional[str] = None  # Optional stock keeping unit for identifying the item
     managed_by: Optional[str] = None  # Optional field for tracking who is managing the order
     added_by: Optional[str] = None  # Optional field for tracking who added the order
-    status: str = Field(default="Pending", regex="^(Pending|Shipped|Delivered|Canceled)$")
+    status: str = Field(default="Pending", pattern="^(Pending|Shipped|Delivered|Canceled)$")
     # Default status is "Pending"; validation ensures the status is one of the predefined options
     created_date: Optional[datetime] = None  # Optional field for tracking when the order was created
     modified_date: Optional[datetime] = None  # Optional field for tracking when the order was last modified
@@ -26,4 +24,28 @@ class Item(BaseModel):
     item_name: str  # Required name of the item
     price: str  # Required price of the item (string type, possibly for currencies like "$50")
     sku: str  # Required stock keeping unit for identifying the item
-    created_date: Optional[datetime] = None  # Optional field for tracking when the item was created
\ No newline at end of file
+    created_date: Optional[datetime] = None  # Optional field for tracking when the item was created
+
+# BulkStatusUpdate class for moving many orders to a new status in one request
+class BulkStatusUpdate(BaseModel):
+    order_ids: List[str]  # Orders to update
+    status: Literal["Pending", "Shipped", "Delivered", "Canceled"]  # New status for every listed order
+
+# OrderFieldUpdate class for one entry of a bulk field update
+class OrderFieldUpdate(BaseModel):
+    order_id: str  # Order to update
+    fields: Dict[str, Any]  # Fields to set on the order
+
+# BulkFieldUpdate class for updating fields of many orders in one request
+class BulkFieldUpdate(BaseModel):
+    updates: List[OrderFieldUpdate]  # One entry per order
+
+# OrderFilter class for selecting orders by filter instead of by ID
+class OrderFilter(BaseModel):
+    status: Optional[str] = None  # Filter by order status
+    managed_by: Optional[str] = None  # Filter by manager
+
+# BulkDelete class for deleting many orders, either listed by ID or selected by a filter
+class BulkDelete(BaseModel):
+    order_ids: Optional[List[str]] = None  # Orders to delete
+    filter: Optional[OrderFilter] = None  # Alternatively, delete every order matching this filter
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, HTTPException, Request  # FastAPI utilities for routing and exception handling
+
+from utils.analytics import rebuild_rollups  # Order analytics rollups
+from utils.catalog import catalog  # In-memory item catalog cache
+from utils.directory import directory  # Cached user directory listings
+from utils.response_cache import response_cache  # Versioned list response cache
+from utils.admission import admission  # Per-route-class admission control
+from utils.indexes import index_usage_stats, explain_route_queries, index_failures  # Index reporting helpers
+
+router = APIRouter()  # Creating a router instance for grouping admin endpoints
+
+
+def require_admin(request: Request):
+    """Reject the request unless the session belongs to an admin."""
+    if request.session.get('usertype') != 'admin':
+        raise HTTPException(status_code=403, detail="Only admins can access this endpoint")
+
+
+# Endpoint reporting index usage and the query plan of every registered route query
+@router.get("/indexes")
+async def get_index_report(request: Request):
+    require_admin(request)
+    try:
+        queries = await explain_route_queries()
+        return {
+            "usage": await index_usage_stats(),
+            "queries": queries,
+            "collscans": [query["route"] for query in queries if query["collscan"]],
+            "failed": index_failures,  # Registered indexes that could not be created at startup
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Endpoint reporting the item catalog cache hit/miss counters
+@router.get("/cache/catalog")
+async def get_catalog_cache_stats(request: Request):
+    require_admin(request)
+    return catalog.get_stats()
+
+
+# Endpoint to drop the cached item catalog after items were changed outside the app
+@router.post("/cache/catalog/invalidate")
+async def invalidate_catalog_cache(request: Request):
+    require_admin(request)
+    catalog.invalidate()
+    return {"message": "Item catalog cache invalidated"}
+
+
+# Endpoint reporting the user directory cache hit/miss counters
+@router.get("/cache/directory")
+async def get_directory_cache_stats(request: Request):
+    require_admin(request)
+    return directory.get_stats()
+
+
+# Endpoint reporting the list response cache hit/miss/304 counters
+@router.get("/cache/responses")
+async def get_response_cache_stats(request: Request):
+    require_admin(request)
+    return response_cache.get_stats()
+
+
+# Endpoint reporting active requests, queue depth and rejections per admission-controlled route class
+@router.get("/admission")
+async def get_admission_stats(request: Request):
+    require_admin(request)
+    return admission.get_stats()
+
+
+# Endpoint to recompute the order analytics rollups from the orders collection
+@router.post("/analytics/rebuild")
+async def rebuild_analytics(request: Request):
+    require_admin(request)
+    try:
+        documents = await rebuild_rollups()
+        return {"message": "Order rollups rebuilt", "rollup_documents": documents}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,23 @@
+from typing import Optional  # For defining optional parameters
+
+from fastapi import APIRouter, HTTPException  # FastAPI utilities for routing and exception handling
+
+from utils.analytics import get_analytics  # Rollup-backed order aggregates
+
+router = APIRouter()  # Creating a router instance for grouping analytics endpoints
+
+
+# Endpoint returning dashboard aggregates: orders per status, revenue per manager and orders per day
+@router.get("/orders")
+async def order_analytics(
+    source: str = "rollup",  # "rollup" (precomputed, constant time) or "live" (aggregation pipeline)
+    days: Optional[int] = None  # Only return the most recent N days of the per-day series
+):
+    if source not in ("rollup", "live"):
+        raise HTTPException(status_code=400, detail="source must be 'rollup' or 'live'")
+    if days is not None and days < 1:
+        raise HTTPException(status_code=400, detail="days must be positive")
+    try:
+        return await get_analytics(source, days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
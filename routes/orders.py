@@ -2,31 +2,61 @@ from datetime import datetime, timezone  # For handling datetime operations
 from typing import Optional  # For defining optional parameters
 
 from bson import ObjectId  # For working with MongoDB Object IDs
-from fastapi import APIRouter, HTTPException  # FastAPI utilities for routing and exception handling
+from fastapi import APIRouter, HTTPException, Request, Response  # FastAPI utilities for routing and exception handling
+from fastapi.responses import StreamingResponse  # For streaming NDJSON responses
 from pydantic import ValidationError  # For handling validation errors in models
+from pymongo import ReturnDocument  # For returning the pre-update document
+from pymongo.errors import DuplicateKeyError  # Raised when an order_id is already taken
 
-from database import order_collection, items_collection  # Importing collections for database operations
-from models.orders import Order, Item  # Importing data models for orders and items
-from utils.helpers import serialize_order, generate_short_order_id, generate_invoice_pdf, send_email
-# Utility functions for serialization, ID generation, invoice creation, and sending emails
+from database import order_collection  # Importing the orders collection for database operations
+from models.orders import Order, Item, BulkStatusUpdate, BulkFieldUpdate, BulkDelete  # Importing data models
+from utils.helpers import generate_short_order_id, insert_order  # Order ID generation and insertion
+from utils.serializers import ORDER_LIST_PROJECTION  # Fields returned by the order list endpoints
+from utils.catalog import catalog  # In-memory item catalog cache
+from utils.pagination import encode_cursor, decode_cursor, keyset_query, count_orders  # Keyset pagination helpers
+from utils.analytics import apply_rollup_changes  # Incremental analytics rollups
+from utils.delta_export import record_tombstones  # Deletions reported by the delta export
+from utils.search import search_document, search_updates, text_search, prefix_search  # Order search
+from utils.streaming import wants_ndjson, accepts_gzip, stream_ndjson, gzip_stream  # Streamed NDJSON responses
+from utils.export_csv import EXPORT_BATCH_SIZE  # Documents read per cursor batch when streaming
+from utils.search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SEARCH_MAX_PAGE
+from utils.bulk_orders import bulk_update_orders, bulk_delete_orders, order_ids_matching, summarize  # Bulk writes
+from utils.jobs import enqueue_invoice_job, enqueue_bulk_invoice_job, get_job  # Background invoice jobs
+from utils.invoices import invoice_digest, INVOICE_LINES  # Invoice content digests
+from utils.invoice_store import invoice_store, ensure_invoice  # Content-addressed invoice storage
+from utils.response_cache import response_cache, etag_matches  # Versioned response cache and conditional GET
+from utils.logger import get_logger, log_fields  # Queue-backed structured logging
+
+logger = get_logger(__name__)
 
 router = APIRouter()  # Creating a router instance for grouping related endpoints
 
-# Endpoint to retrieve item details from the database
+# Endpoint to retrieve item details, served from the in-memory catalog cache
 @router.get("/get_items")
-async def show_items():
-    item_cursor = items_collection.find({}, {"item_id": 1, "item_name": 1, "item_inventory": 1, "sku": 1, "price": 1, "_id": 0})
-    item_list = await item_cursor.to_list(length=None)  # Convert cursor to a list
-    return {"orders": item_list}  # Return the list of items
+async def show_items(request: Request):
+    async def load():
+        item_list = await catalog.get_items()  # Cached copy of the items collection
+        return {"orders": item_list}  # Return the list of items
+
+    # Unchanged responses are served from the response cache, or answered with 304 on a matching ETag
+    return await response_cache.respond(request, ("items",), load)
 
-# Endpoint to retrieve all orders based on optional filters
+# Endpoint to retrieve all orders based on optional filters, as one JSON document or streamed as NDJSON
 @router.get("/get_all_orders")
 async def get_all_orders(
+    request: Request,
     status: Optional[str] = None,  # Filter by order status
     managed_by: Optional[str] = None,  # Filter by manager
     sort_by: Optional[str] = "created_date",  # Field to sort by (default: created_date)
-    sort_order: Optional[int] = -1  # Sort order (-1 for descending, 1 for ascending)
+    sort_order: Optional[int] = -1,  # Sort order (-1 for descending, 1 for ascending)
+    format: Optional[str] = None,  # "json" or "ndjson" (default: chosen by the Accept header)
+    batch_size: int = EXPORT_BATCH_SIZE  # Orders read from the cursor per streamed chunk
 ):
+    if format not in (None, "json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    if batch_size < 1 or batch_size > 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+
     try:
         query = {}  # Initialize query dictionary
         if status:
@@ -34,13 +64,25 @@ async def get_all_orders(
         if managed_by:
             query["managed_by"] = managed_by  # Add manager filter if provided
 
-        # Fetch matching orders and sort results
-        cursor = order_collection.find(query).sort(sort_by, sort_order)
-        orders = await cursor.to_list(length=None)  # Convert cursor to list
+        # Streaming mode: one order per line straight from the cursor, gzipped on the fly when accepted,
+        # so memory stays flat and the client can start on the first batch while the rest is read
+        if wants_ndjson(request, format):
+            cursor = order_collection.find(query, ORDER_LIST_PROJECTION).sort(sort_by, sort_order)
+            stream = stream_ndjson(cursor, batch_size)
+            headers = {"Vary": "Accept, Accept-Encoding"}
+            if accepts_gzip(request):
+                stream = gzip_stream(stream)
+                headers["Content-Encoding"] = "gzip"
+            return StreamingResponse(stream, media_type="application/x-ndjson", headers=headers)
 
-        # Serialize orders for response
-        serialized_orders = [serialize_order(order) for order in orders]
-        return {"orders": serialized_orders}
+        async def load():
+            # Fetch only the listed fields of matching orders and sort results
+            cursor = order_collection.find(query, ORDER_LIST_PROJECTION).sort(sort_by, sort_order)
+            orders = await cursor.to_list(length=None)  # Convert cursor to list
+            return {"orders": orders}
+
+        # Served from the response cache until an order is written; a matching ETag gets a 304
+        return await response_cache.respond(request, ("orders",), load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))  # Handle unexpected errors
 
@@ -48,12 +90,13 @@ async def get_all_orders(
 @router.post("/create_order")
 async def create_order(order_data: dict):
     try:
-        # Generate an order ID if missing
-        order_data["order_id"] = order_data.get("order_id") or await generate_short_order_id()
+        # Generate an order ID if missing; collisions are resolved on insert by the unique index
+        id_generated = not order_data.get("order_id")
+        order_data["order_id"] = order_data.get("order_id") or generate_short_order_id()
 
         # Fetch item price if not provided
         if "price" not in order_data or not order_data["price"]:
-            item = await items_collection.find_one({"item_name": order_data["item_name"]}, {"price": 1, "_id": 0})
+            item = await catalog.get_by_name(order_data["item_name"])
             if not item or "price" not in item:
                 raise HTTPException(status_code=404, detail="Item not found or price missing")
             order_data["price"] = item["price"]
@@ -61,39 +104,178 @@ async def create_order(order_data: dict):
         # Add other computed fields to the order
         order_data["created_date"] = datetime.now(timezone.utc).isoformat()  # Add current timestamp
         order_data["status"] = order_data.get("status", "Pending")  # Default status: Pending
+        order_data["invoice_status"] = "queued"  # Invoice is rendered and emailed by a background worker
 
-        # Save the order to the database
-        await order_collection.insert_one(order_data)
-        print("Order added to the database")
-
-        # Convert order data to Order model for email and other operations
-        order_model = Order(**order_data)
-        print("Order converted to model")
+        # Validate the order data against the Order model before saving
+        Order(**order_data)
+        order_data["search"] = search_document(order_data)  # Normalized copies for prefix search
 
-        # Generate invoice and send email
-        pdf_path = generate_invoice_pdf(order_data)
-        print("Order invoice saved")
+        # Save the order to the database
+        await insert_order(order_data, regenerate_id=id_generated)
+        logger.info("Order added to the database", extra=log_fields(order_id=order_data["order_id"]))
+        await apply_rollup_changes(added=[order_data])
 
-        print("Sending email")
-        await send_email(order_model, pdf_path)
-        print("Email sent")
+        # Queue invoice generation and email delivery instead of doing it on the request path
+        await enqueue_invoice_job(order_data["order_id"])
+        logger.debug("Invoice job queued", extra=log_fields(order_id=order_data["order_id"]))
 
-        return {"message": "Order created successfully", "order_id": order_data["order_id"]}
+        return {"message": "Order created successfully", "order_id": order_data["order_id"], "invoice_status": "queued"}
     except ValidationError as e:
         raise HTTPException(status_code=422, detail=f"Invalid order data: {str(e)}")  # Handle validation errors
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Order ID already exists")  # Caller-supplied ID is taken
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")  # Handle unexpected errors
 
+# Endpoint to re-render the invoices of every order matching a filter in the background
+@router.post("/invoices/bulk")
+async def bulk_render_invoices(
+    status: Optional[str] = None,  # Filter by order status
+    managed_by: Optional[str] = None,  # Filter by manager
+    date_from: Optional[datetime] = None,  # Only orders created at or after this date
+    date_to: Optional[datetime] = None  # Only orders created at or before this date
+):
+    try:
+        job_id = await enqueue_bulk_invoice_job(status, managed_by, date_from, date_to)
+        return {"message": "Bulk invoice rendering queued", "job_id": str(job_id)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint to report the progress of a bulk invoice rendering job
+@router.get("/invoices/bulk/{job_id}")
+async def bulk_render_progress(job_id: str):
+    job = await get_job(job_id)
+    if not job or job["type"] != "bulk_invoice":
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job_id,
+        "state": job["state"],
+        "progress": job.get("progress", {}),
+        "last_error": job.get("last_error"),
+    }
+
+# Endpoint to search orders by SKU, customer email, customer name or item name
+@router.get("/search")
+async def search_orders(
+    request: Request,
+    q: str,  # Search terms
+    mode: str = "text",  # "text" for relevance-ranked whole words, "prefix" for as-you-type matching
+    status: Optional[str] = None,  # Filter by order status
+    managed_by: Optional[str] = None,  # Filter by manager
+    page: int = 1,  # 1-based page number
+    limit: int = SEARCH_DEFAULT_LIMIT  # Results per page
+):
+    if mode not in ("text", "prefix"):
+        raise HTTPException(status_code=400, detail="mode must be text or prefix")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty")
+    if page < 1 or page > SEARCH_MAX_PAGE:
+        raise HTTPException(status_code=400, detail=f"page must be between 1 and {SEARCH_MAX_PAGE}")
+    if limit < 1 or limit > SEARCH_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+    try:
+        search = text_search if mode == "text" else prefix_search
+
+        async def load():
+            orders, has_more = await search(q, status=status, managed_by=managed_by, page=page, limit=limit)
+            return {"orders": orders, "page": page, "limit": limit, "has_more": has_more, "mode": mode}
+
+        # Repeated searches are served from the response cache until an order is written
+        return await response_cache.respond(request, ("orders",), load)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint to suggest catalog items by item_name or sku prefix for the order form
+@router.get("/autocomplete/items")
+async def autocomplete_items(q: str, limit: int = 10):
+    if limit < 1 or limit > 50:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 50")
+    items = await catalog.autocomplete(q, limit)  # Served from the in-memory catalog, no database round trip
+    return {"items": items}
+
+# Endpoint to download an order's invoice, rendered on demand and reused while the order is unchanged
+@router.get("/{order_id}/invoice")
+async def download_invoice(order_id: str, request: Request):
+    projection = {field: 1 for _, field in INVOICE_LINES}
+    projection["_id"] = 0
+    order = await order_collection.find_one({"order_id": order_id}, projection)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    # The invoice is addressed by the digest of its content, so the digest doubles as a strong ETag
+    digest = invoice_digest(order)
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        await ensure_invoice(order)
+        # A Range is only honoured when If-Range (if sent) still names this version of the invoice
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if if_range is not None and if_range != etag:
+            range_header = None
+        return await invoice_store.response(digest, headers, f"{order_id}.pdf", range_header)
+    except Exception as e:
+        logger.error("Failed to serve invoice: %s", e, extra=log_fields(order_id=order_id))
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint to move many orders to a new status with chunked, unordered bulk writes
+@router.post("/bulk/status")
+async def bulk_update_status(request: BulkStatusUpdate):
+    try:
+        results = await bulk_update_orders({order_id: {"status": request.status} for order_id in request.order_ids})
+        return {"summary": summarize(results), "results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint to apply per-order field updates with chunked, unordered bulk writes
+@router.post("/bulk/update")
+async def bulk_update_fields(request: BulkFieldUpdate):
+    try:
+        updates = {}
+        for update in request.updates:
+            updates.setdefault(update.order_id, {}).update(update.fields)  # Merge repeated order_ids
+        results = await bulk_update_orders(updates)
+        return {"summary": summarize(results), "results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Endpoint to delete orders listed by order_id or matching a filter
+@router.post("/bulk/delete")
+async def bulk_delete(request: BulkDelete):
+    if request.order_ids is None and request.filter is None:
+        raise HTTPException(status_code=400, detail="Provide order_ids or a filter")
+    try:
+        order_ids = list(request.order_ids or [])
+        if request.filter is not None:
+            query = request.filter.model_dump(exclude_none=True)
+            if not query:
+                raise HTTPException(status_code=400, detail="The filter must set at least one field")
+            order_ids.extend(await order_ids_matching(query))
+        results = await bulk_delete_orders(order_ids)
+        return {"summary": summarize(results), "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Endpoint to update an order
 @router.put("/{id}")
 async def update_order(id: str, updated_order: Order):
     updated_order_dict = updated_order.model_dump(exclude_unset=True)  # Convert model to dictionary
     updated_order_dict["modified_date"] = datetime.now(timezone.utc)  # Add modified_date field
+    updated_order_dict.update(search_updates(updated_order_dict))  # Keep the normalized search fields in step
 
     try:
-        result = await order_collection.update_one({"order_id": id}, {"$set": updated_order_dict})
-        if result.matched_count == 0:
+        # Fetch the previous version in the same round trip so the rollups can be adjusted
+        previous = await order_collection.find_one_and_update(
+            {"order_id": id}, {"$set": updated_order_dict}, return_document=ReturnDocument.BEFORE
+        )
+        if previous is None:
             raise HTTPException(status_code=404, detail="Order not found")
+        await apply_rollup_changes(added=[{**previous, **updated_order_dict}], removed=[previous])
         return {"message": "Order updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -102,9 +284,11 @@ async def update_order(id: str, updated_order: Order):
 @router.delete("/{id}")
 async def delete_order(id: str):
     try:
-        result = await order_collection.delete_one({"order_id": id})
-        if result.deleted_count == 0:
+        deleted = await order_collection.find_one_and_delete({"order_id": id})
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Order not found")
+        await apply_rollup_changes(removed=[deleted])
+        await record_tombstones([id])  # Reported as a deletion by the delta export
         return {"message": "Order deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -112,13 +296,27 @@ async def delete_order(id: str):
 # Endpoint to list orders with pagination and sorting
 @router.get("/list_orders")
 async def list_orders(
-    page: int = 1,  # Page number (default: 1)
+    request: Request,
+    page: int = 1,  # Page number (default: 1), used in page mode
     limit: int = 10,  # Number of items per page (default: 10)
     status: Optional[str] = None,  # Filter by order status
     managed_by: Optional[str] = None,  # Filter by manager
     sort_by: Optional[str] = "created_date",  # Field to sort by (default: created_date)
-    sort_order: Optional[int] = -1  # Sort order (-1 for descending, 1 for ascending)
+    sort_order: Optional[int] = -1,  # Sort order (-1 for descending, 1 for ascending)
+    pagination: str = "page",  # "page" (skip/limit) or "cursor" (keyset, constant cost per page)
+    cursor: Optional[str] = None,  # Continuation token returned as next_cursor by the previous page
+    count: Optional[str] = None  # exact, estimated, cached or none (default: exact in page mode, none in cursor mode)
 ):
+    if pagination not in ("page", "cursor"):
+        raise HTTPException(status_code=400, detail="pagination must be 'page' or 'cursor'")
+    if page < 1 or limit < 1:
+        raise HTTPException(status_code=400, detail="page and limit must be at least 1")
+    if sort_order not in (1, -1):
+        raise HTTPException(status_code=400, detail="sort_order must be 1 or -1")
+    count = count or ("exact" if pagination == "page" else "none")
+    if count not in ("exact", "estimated", "cached", "none"):
+        raise HTTPException(status_code=400, detail="count must be exact, estimated, cached or none")
+
     try:
         query = {}  # Initialize query dictionary
         if status:
@@ -126,17 +324,38 @@ async def list_orders(
         if managed_by:
             query["managed_by"] = managed_by  # Add manager filter if provided
 
-        # Calculate pagination parameters
-        skip = (page - 1) * limit
-        cursor = order_collection.find(query).sort(sort_by, sort_order).skip(skip).limit(limit)
-        orders = await cursor.to_list(length=limit)
+        # Keyset mode: resume after the (sort_by, _id) pair of the previous page
+        find_query = query
+        if pagination == "cursor" and cursor:
+            try:
+                find_query = keyset_query(query, decode_cursor(cursor, sort_by, sort_order), sort_by, sort_order)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        async def load():
+            # Count matching orders according to the requested mode
+            total_orders = await count_orders(order_collection, query, count)
+            projection = {**ORDER_LIST_PROJECTION, sort_by: 1}  # The sort field is needed for the cursor token
+
+            if pagination == "page":
+                # Calculate pagination parameters
+                skip = (page - 1) * limit
+                page_cursor = order_collection.find(query, projection).sort(sort_by, sort_order).skip(skip).limit(limit)
+                orders = await page_cursor.to_list(length=limit)
+                return {"orders": orders, "total": total_orders}
 
-        # Count total matching orders
-        total_orders = await order_collection.count_documents(query)
+            # Fetch one extra document to know whether another page exists
+            page_cursor = order_collection.find(find_query, projection).sort([(sort_by, sort_order), ("_id", sort_order)]).limit(limit + 1)
+            orders = await page_cursor.to_list(length=limit + 1)
+            has_more = len(orders) > limit
+            orders = orders[:limit]
+            next_cursor = encode_cursor(orders[-1], sort_by, sort_order) if has_more else None
+            return {"orders": orders, "total": total_orders, "next_cursor": next_cursor}
 
-        # Serialize and return response
-        serialized_orders = [serialize_order(order) for order in orders]
-        return {"orders": serialized_orders, "total": total_orders}
+        # Served from the response cache until an order is written; a matching ETag gets a 304
+        return await response_cache.respond(request, ("orders",), load)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,46 +1,41 @@
+from typing import Optional
+
 from bson import ObjectId
-from fastapi import Request, Response, HTTPException, APIRouter
+from fastapi import Request, Response, HTTPException, APIRouter, Query
 
 from database import register_collection, employee_collection
 from models.users import Users
 
 from utils.helpers import serialize_user
+from utils.serializers import FastJSONResponse
+from utils.directory import directory, user_search_document, VISIBLE_ROLES, DIRECTORY_DEFAULT_LIMIT, DIRECTORY_MAX_LIMIT
+from utils.logger import get_logger, log_fields
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
 
+# Endpoint to list the staff visible to the session's role, one page at a time
 @router.post("/show_user")
-async def show_user(request: Request):
+async def show_user(
+    request: Request,
+    search: Optional[str] = None,  # Case-insensitive name or email prefix
+    cursor: Optional[str] = None,  # next_cursor from the previous page
+    limit: int = Query(DIRECTORY_DEFAULT_LIMIT, ge=1, le=DIRECTORY_MAX_LIMIT),  # Users per page
+):
     user_role = request.session.get('usertype', 'manager')  # Default to 'manager' if not found
-    users = []
 
     try:
-        if user_role == 'admin':
-            managers = await employee_collection.find(
-                {"usertype": "manager"},
-                {"name": 1, "usertype": 1, "_id": 1}
-            ).to_list(length=None)
-            employees = await employee_collection.find(
-                {"usertype": "employee"},
-                {"name": 1, "usertype": 1, "_id": 1}
-            ).to_list(length=None)
-            users.extend(managers)
-            users.extend(employees)
-
-        elif user_role == 'manager':
-            employees = await employee_collection.find(
-                {"usertype": "employee"},
-                {"name": 1, "usertype": 1, "_id": 1}
-            ).to_list(length=None)
-            users.extend(employees)
-
-        # Serialize all users to handle ObjectId
-        serialized_users = [serialize_user(user) for user in users]
-
-        return {"message": "Users retrieved successfully", "users": serialized_users}
+        # Managers and employees are fetched with a single $in query on usertype
+        page = await directory.list_users("staff", VISIBLE_ROLES.get(user_role, ()), search, cursor, limit)
+        # Encode the raw documents directly (ObjectId handled by the encoder)
+        return FastJSONResponse({"message": "Users retrieved successfully", **page})
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Error retrieving users: {e}")
+        logger.error("Error retrieving users: %s", e)
         raise HTTPException(status_code=500, detail="An error occurred while retrieving users.")
 
 
@@ -49,7 +44,7 @@ async def assign_user(request:Request, user:Users):
     user_role = request.session.get('usertype', 'manager')
     existing_user = await register_collection.find_one({"email": user.personal_email})
     if not existing_user:
-        print("User already exists with email:", user.email, flush=True)
+        logger.info("Registered user not found", extra=log_fields(email=user.personal_email))
         raise HTTPException(status_code=400, detail="User already exists")
 
     user_data = {
@@ -59,6 +54,7 @@ async def assign_user(request:Request, user:Users):
         "password": user.password,
         "usertype": user.usertype
     }
+    user_data["search"] = user_search_document("staff", user_data)  # Normalized copies for the directory search
 
     if user_role == 'manager' and user_role != 'admin':
         raise HTTPException(status_code=403, detail="Only admins can assign the manager role")
@@ -78,18 +74,21 @@ async def assign_user(request:Request, user:Users):
     return {"message":"user created successfully", "user role assigned":{user.usertype}, "created by":{user_role}}
 
 @router.post("/unassigned_user")
-async def get_unassigned_users():
-    unassigned = await register_collection.find(
-        {"usertype": "visitor"},
-        {"email": 1, "_id": 1, "usertype":1}
-    ).to_list(length=None)
-    # Apply your serializer to each user in the list
-    serialized_users = [serialize_user(user) for user in unassigned]
-    return {"unassigned_users": serialized_users}
+async def get_unassigned_users(
+    search: Optional[str] = None,  # Case-insensitive name or email prefix
+    cursor: Optional[str] = None,  # next_cursor from the previous page
+    limit: int = Query(DIRECTORY_DEFAULT_LIMIT, ge=1, le=DIRECTORY_MAX_LIMIT),  # Users per page
+):
+    try:
+        page = await directory.list_users("registered", ("visitor",), search, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Encode the raw documents directly (ObjectId handled by the encoder)
+    return FastJSONResponse({"unassigned_users": page["users"], "next_cursor": page["next_cursor"]})
 
 @router.get("/unassigned_user/{user_id}")
 async def get_unassigned_user(user_id: str):
-    user_doc = await register_collection.find_one({"_id": ObjectId(user_id)})
+    user_doc = await register_collection.find_one({"_id": ObjectId(user_id)}, {"search": 0})  # Internal search copies
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     return {"user": serialize_user(user_doc)}
\ No newline at end of file
@@ -0,0 +1,223 @@
+import asyncio
+import math
+import os
+import re
+import time
+from collections import deque
+
+from fastapi.responses import JSONResponse
+
+from utils.logger import get_logger, log_fields
+from utils.metrics import Counter, Gauge, Histogram
+
+logger = get_logger(__name__)
+
+# How long a request may wait in its class's queue before it is turned away with a 503 (seconds)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+# Expensive route classes: (concurrent requests per worker process, requests allowed to wait).
+# Each limit can be overridden with ADMISSION_<CLASS>_CONCURRENCY / ADMISSION_<CLASS>_QUEUE.
+# Together they stay well below MONGO_MAX_POOL_SIZE, leaving connections for interactive routes.
+ROUTE_CLASS_LIMITS = {
+    "export": (2, 4),        # Full and delta CSV/NDJSON exports, which stream the whole collection
+    "import": (2, 4),        # Uploads being staged to disk
+    "bulk": (4, 8),          # Unbounded order lists, bulk writes, bulk invoice jobs, rollup rebuilds
+    "invoice": (4, 16),      # Invoice downloads, rendered on demand on a cold store
+    "order_write": (16, 64), # Order create/update/delete (rollups, tombstones, invoice jobs)
+}
+
+# (method, path pattern, route class); the first match wins and unmatched requests are not limited
+ROUTE_CLASS_PATTERNS = [
+    ("GET", re.compile(r"^/export(/delta)?$"), "export"),
+    ("POST", re.compile(r"^/upload_csv$"), "import"),
+    ("GET", re.compile(r"^/orders/get_all_orders$"), "bulk"),
+    ("POST", re.compile(r"^/orders/bulk/(status|update|delete)$"), "bulk"),
+    ("POST", re.compile(r"^/orders/invoices/bulk$"), "bulk"),
+    ("POST", re.compile(r"^/admin/analytics/rebuild$"), "bulk"),
+    ("GET", re.compile(r"^/orders/[^/]+/invoice$"), "invoice"),
+    ("POST", re.compile(r"^/orders/create_order$"), "order_write"),
+    ("PUT", re.compile(r"^/orders/[^/]+$"), "order_write"),
+    ("DELETE", re.compile(r"^/orders/[^/]+$"), "order_write"),
+]
+
+admission_active = Gauge("admission_active_requests", "Requests currently running, by route class.", ("route_class",))
+admission_queued = Gauge("admission_queued_requests", "Requests waiting for a slot, by route class.", ("route_class",))
+admission_rejections = Counter("admission_rejections_total", "Requests turned away by admission control.",
+                               ("route_class", "reason"))
+admission_wait = Histogram("admission_queue_wait_seconds", "Time admitted requests spent queued.", ("route_class",))
+
+
+class Rejected(Exception):
+    """Raised when a request cannot be admitted; carries the status code and the Retry-After hint."""
+
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteClassLimiter:
+    """
+    Concurrency limit with a bounded FIFO wait queue for one route class.
+    A request beyond the limit waits for a slot; when the queue is full it is rejected
+    at once (429), and when it waits longer than `queue_timeout` it is rejected (503).
+    """
+
+    def __init__(self, name, concurrency, queue_size, queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self._service_seconds = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+                      "max_queue_depth": 0, "wait_seconds_total": 0.0, "completed": 0}
+
+    def retry_after(self):
+        """Seconds until a queued request would likely be served, from the mean service time so far."""
+        mean = self._service_seconds / self.stats["completed"] if self.stats["completed"] else 1.0
+        backlog = (len(self._waiters) + 1) / self.concurrency
+        return max(1, math.ceil(mean * backlog))
+
+    def _update_gauges(self):
+        admission_active.set(self.active, self.name)
+        admission_queued.set(len(self._waiters), self.name)
+
+    async def acquire(self):
+        """Wait for a slot; returns the time spent queued or raises Rejected."""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            self._update_gauges()
+            return 0.0
+
+        if len(self._waiters) >= self.queue_size:
+            self.stats["rejected_queue_full"] += 1
+            admission_rejections.inc(self.name, "queue_full")
+            raise Rejected(429, "queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiters))
+        self._update_gauges()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended; pass it on rather than leak it
+                self._hand_over()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            self._update_gauges()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.stats["rejected_timeout"] += 1
+            admission_rejections.inc(self.name, "queue_timeout")
+            raise Rejected(503, "queue_timeout", self.retry_after())
+
+        waited = time.monotonic() - start
+        self.stats["admitted"] += 1
+        self.stats["wait_seconds_total"] += waited
+        admission_wait.observe(waited, self.name)
+        return waited
+
+    def release(self, service_seconds):
+        """Free the slot, handing it straight to the longest-waiting request if there is one."""
+        self._service_seconds += service_seconds
+        self.stats["completed"] += 1
+        self._hand_over()
+
+    def _hand_over(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # The slot moves to the waiter; active is unchanged
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["concurrency"] = self.concurrency
+        stats["queue_size"] = self.queue_size
+        stats["active"] = self.active
+        stats["queue_depth"] = len(self._waiters)
+        stats["mean_service_seconds"] = self._service_seconds / self.stats["completed"] \
+            if self.stats["completed"] else None
+        return stats
+
+
+def _limit(route_class, setting, default):
+    return int(os.getenv(f"ADMISSION_{route_class.upper()}_{setting}", str(default)))
+
+
+class AdmissionController:
+    """The limiters of every route class and the mapping from requests to classes."""
+
+    def __init__(self, limits=ROUTE_CLASS_LIMITS, patterns=ROUTE_CLASS_PATTERNS):
+        self.patterns = patterns
+        self.limiters = {
+            name: RouteClassLimiter(name, _limit(name, "CONCURRENCY", concurrency), _limit(name, "QUEUE", queue))
+            for name, (concurrency, queue) in limits.items()
+        }
+
+    def route_class(self, method, path):
+        """The route class of a request, or None for routes that are not limited."""
+        for pattern_method, pattern, name in self.patterns:
+            if method == pattern_method and pattern.match(path):
+                return name
+        return None
+
+    def get_stats(self):
+        return {name: limiter.get_stats() for name, limiter in self.limiters.items()}
+
+
+# Shared per-worker admission controller
+admission = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware holding each request of a limited route class to its class's concurrency limit
+    for the whole response, streamed bodies included. Requests that cannot be admitted get a 429
+    (queue full) or 503 (queued too long) with Retry-After, without reaching the handler.
+    """
+
+    def __init__(self, app, controller=admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = self.controller.route_class(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.controller.limiters[route_class]
+        try:
+            await limiter.acquire()
+        except Rejected as e:
+            logger.warning("Request rejected by admission control", extra=log_fields(
+                route_class=route_class, reason=e.reason, path=scope["path"]))
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"detail": f"Too many concurrent {route_class} requests, retry later"},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - start)
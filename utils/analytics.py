@@ -0,0 +1,196 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import db, order_collection, rollup_collection
+from utils.indexes import INDEXES
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Order fields the rollups are computed from
+ROLLUP_FIELDS = ("price", "qty", "status", "managed_by", "created_date")
+
+
+def rollup_fields(order):
+    """The part of an order the rollups depend on, small enough to keep with a checkpoint."""
+    return {field: order.get(field) for field in ROLLUP_FIELDS}
+
+
+def _revenue(order):
+    """price * qty, tolerating prices stored as strings (catalog prices) or missing values."""
+    try:
+        return float(order.get("price") or 0) * float(order.get("qty") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _day(order):
+    """Calendar day (YYYY-MM-DD) the order was created on; created_date is a datetime or an ISO string."""
+    created = order.get("created_date")
+    if isinstance(created, datetime):
+        return created.strftime("%Y-%m-%d")
+    if isinstance(created, str) and len(created) >= 10:
+        return created[:10]
+    return None
+
+
+def _add_order(deltas, order, sign):
+    """Accumulate the rollup increments contributed by one order (sign=1 to add, -1 to remove)."""
+    revenue = _revenue(order) * sign
+    deltas[("totals", None)]["count"] += sign
+    deltas[("totals", None)]["revenue"] += revenue
+    deltas[("status", order.get("status"))]["count"] += sign
+    deltas[("manager", order.get("managed_by"))]["count"] += sign
+    deltas[("manager", order.get("managed_by"))]["revenue"] += revenue
+    day = _day(order)
+    if day:
+        deltas[("day", day)]["count"] += sign
+        deltas[("day", day)]["revenue"] += revenue
+
+
+async def apply_rollup_changes(added=(), removed=(), once=None):
+    """
+    Incrementally update the rollups for orders that were added and/or removed.
+    An update is expressed as removing the old version and adding the new one.
+    `once=(scope, sequence)` makes a replay a no-op: each rollup document records the highest sequence
+    applied for the scope and skips changes at or below it (sequences must increase within a scope).
+    Failures are logged rather than raised; POST /admin/analytics/rebuild repairs any drift.
+    """
+    deltas = defaultdict(lambda: {"count": 0, "revenue": 0.0})
+    for order in added:
+        _add_order(deltas, order, 1)
+    for order in removed:
+        _add_order(deltas, order, -1)
+
+    requests = []
+    for (kind, key), inc in deltas.items():
+        if inc["count"] == 0 and inc["revenue"] == 0:
+            continue
+        rollup_id = kind if kind == "totals" else f"{kind}:{key}"
+        query = {"_id": rollup_id}
+        update = {"$inc": inc, "$setOnInsert": {"kind": kind, "key": key}}
+        if once:
+            scope, sequence = once
+            query[f"applied.{scope}"] = {"$not": {"$gte": sequence}}
+            update["$set"] = {f"applied.{scope}": sequence}
+        requests.append(UpdateOne(query, update, upsert=True))
+    if not requests:
+        return
+    try:
+        await rollup_collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        # With `once`, an already-applied document fails the filter and the upsert hits its _id: skip it
+        errors = [error for error in e.details.get("writeErrors", []) if not (once and error.get("code") == 11000)]
+        if errors or e.details.get("writeConcernErrors"):
+            logger.error("Failed to update order rollups: %s", errors or e.details["writeConcernErrors"])
+    except Exception as e:
+        logger.error("Failed to update order rollups: %s", e)
+
+
+async def clear_rollup_markers(scope):
+    """Drop the replay markers `once` left for a scope whose changes are all applied."""
+    try:
+        await rollup_collection.update_many({f"applied.{scope}": {"$exists": True}},
+                                            {"$unset": {f"applied.{scope}": ""}})
+    except Exception as e:
+        logger.error("Failed to clear rollup markers: %s", e)
+
+
+# Expression helpers shared by the live aggregation and the rebuild
+_REVENUE_EXPR = {"$multiply": [
+    {"$convert": {"input": "$price", "to": "double", "onError": 0, "onNull": 0}},
+    {"$convert": {"input": "$qty", "to": "double", "onError": 0, "onNull": 0}},
+]}
+_DAY_EXPR = {"$cond": [
+    {"$eq": [{"$type": "$created_date"}, "date"]},
+    {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_date"}},
+    {"$substrBytes": [{"$ifNull": [{"$toString": "$created_date"}, ""]}, 0, 10]},
+]}
+
+ANALYTICS_PIPELINE = [
+    {"$facet": {
+        "totals": [{"$group": {"_id": None, "count": {"$sum": 1}, "revenue": {"$sum": _REVENUE_EXPR}}}],
+        "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}, "revenue": {"$sum": _REVENUE_EXPR}}}],
+        "manager": [{"$group": {"_id": "$managed_by", "count": {"$sum": 1}, "revenue": {"$sum": _REVENUE_EXPR}}}],
+        "day": [
+            {"$group": {"_id": _DAY_EXPR, "count": {"$sum": 1}, "revenue": {"$sum": _REVENUE_EXPR}}},
+            {"$match": {"_id": {"$ne": ""}}},
+        ],
+    }},
+]
+
+
+async def _aggregate_rollups():
+    """Compute every rollup document from scratch with one aggregation over the orders."""
+    result = await order_collection.aggregate(ANALYTICS_PIPELINE, allowDiskUse=True).to_list(length=1)
+    facets = result[0] if result else {}
+    rollups = []
+    for kind in ("totals", "status", "manager", "day"):
+        for row in facets.get(kind, []):
+            key = None if kind == "totals" else row["_id"]
+            rollups.append({
+                "_id": kind if kind == "totals" else f"{kind}:{key}",
+                "kind": kind,
+                "key": key,
+                "count": row["count"],
+                "revenue": row["revenue"],
+            })
+    return rollups
+
+
+def _format(rollups, days=None):
+    """Shape rollup documents into the analytics response."""
+    by_kind = defaultdict(list)
+    for rollup in rollups:
+        by_kind[rollup["kind"]].append(rollup)
+    totals = by_kind["totals"][0] if by_kind["totals"] else {"count": 0, "revenue": 0.0}
+    per_day = sorted(by_kind["day"], key=lambda r: r["key"], reverse=True)
+    if days:
+        per_day = per_day[:days]
+    return {
+        "total_orders": totals["count"],
+        "total_revenue": round(totals["revenue"], 2),
+        "orders_per_status": {r["key"]: r["count"] for r in by_kind["status"] if r["count"]},
+        "revenue_per_manager": {str(r["key"]): round(r["revenue"], 2) for r in by_kind["manager"] if r["count"]},
+        "orders_per_day": [{"day": r["key"], "count": r["count"], "revenue": round(r["revenue"], 2)}
+                           for r in per_day if r["count"]],
+    }
+
+
+async def get_analytics(source="rollup", days=None):
+    """Dashboard aggregates, from the rollup collection or computed live from the orders."""
+    if source == "live":
+        return _format(await _aggregate_rollups(), days)
+    rollups = await rollup_collection.find({"kind": {"$ne": "day"}}).to_list(length=None)
+    # Only the most recent `days` day rollups are read (all of them when days is not given)
+    day_cursor = rollup_collection.find({"kind": "day"}).sort("key", -1).limit(days or 0)
+    rollups.extend(await day_cursor.to_list(length=None))
+    return _format(rollups, days)
+
+
+async def rebuild_rollups():
+    """
+    Recompute the rollups from the orders and atomically swap them in.
+    Increments applied while the aggregation runs are lost, so run it at a quiet time.
+    """
+    rollups = await _aggregate_rollups()
+    staging = db[rollup_collection.name + "_rebuild"]
+    await staging.drop()
+    if rollups:
+        await staging.insert_many(rollups)
+        await staging.create_indexes(INDEXES[rollup_collection.name])
+        await staging.rename(rollup_collection.name, dropTarget=True)
+    else:
+        await rollup_collection.delete_many({})
+    logger.info("Rebuilt order rollups (%d documents)", len(rollups))
+    return len(rollups)
+
+
+if __name__ == "__main__":
+    # Rebuild command: python -m utils.analytics
+    print(f"Rebuilt {asyncio.run(rebuild_rollups())} rollup documents")
@@ -0,0 +1,151 @@
+import os
+from typing import Annotated
+
+from pydantic import TypeAdapter, ValidationError
+from pymongo import UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+
+from database import order_collection
+from models.orders import Order
+from utils.analytics import apply_rollup_changes
+from utils.delta_export import record_tombstones
+from utils.search import search_updates
+
+# Number of orders sent per bulk_write round trip
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+# Fields a bulk field update may set; identity and timestamps are managed by the server
+BULK_UPDATABLE_FIELDS = {
+    "customer_name", "customer_email", "item_name", "price", "qty", "sku", "managed_by", "added_by", "status",
+}
+
+# Validators for the updatable fields, with the same types and constraints as the Order model
+_FIELD_ADAPTERS = {
+    name: TypeAdapter(Annotated[Order.model_fields[name].annotation, Order.model_fields[name]])
+    for name in BULK_UPDATABLE_FIELDS
+}
+
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _in_order(results, order_ids):
+    """Return the results in the order the order_ids were requested."""
+    position = {order_id: index for index, order_id in reversed(list(enumerate(order_ids)))}
+    return sorted(results, key=lambda result: position[result["order_id"]])
+
+
+async def _existing_orders(order_ids):
+    """Fetch the current version of the listed orders, keyed by order_id (used for results and rollups)."""
+    cursor = order_collection.find({"order_id": {"$in": order_ids}}, {"_id": 0})
+    return {order["order_id"]: order async for order in cursor}
+
+
+def validate_fields(fields):
+    """Validate and coerce the values of a bulk field update against the Order model; raises ValueError."""
+    invalid = set(fields) - BULK_UPDATABLE_FIELDS
+    if invalid:
+        raise ValueError(f"Fields cannot be updated: {', '.join(sorted(invalid))}")
+    validated = {}
+    for name, value in fields.items():
+        try:
+            validated[name] = _FIELD_ADAPTERS[name].validate_python(value)
+        except ValidationError as e:
+            raise ValueError(f"Invalid value for {name}: {e.errors()[0]['msg']}")
+    return validated
+
+
+def _write_errors(error_details):
+    """Map bulk_write error indexes to messages."""
+    return {error["index"]: error.get("errmsg", "write error") for error in error_details.get("writeErrors", [])}
+
+
+async def _run_bulk(requests):
+    """Run an unordered bulk_write, returning {request index: error message} for the failed operations."""
+    if not requests:
+        return {}
+    try:
+        await order_collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        # Only the listed operations failed; any other error propagates, as nothing can be said about the chunk
+        return _write_errors(e.details)
+    return {}
+
+
+async def bulk_update_orders(updates):
+    """
+    Apply {order_id: fields} updates with one unordered bulk_write per chunk.
+    modified_date is set by the server with $currentDate. Returns one result per order.
+    """
+    results = []
+    items = list(updates.items())
+    for chunk in _chunks(items):
+        existing = await _existing_orders([order_id for order_id, _ in chunk])
+
+        requests = []
+        request_ids = []
+        validated = {}
+        for order_id, fields in chunk:
+            if order_id not in existing:
+                results.append({"order_id": order_id, "result": "not_found"})
+                continue
+            try:
+                fields = validated[order_id] = validate_fields(fields)
+            except ValueError as e:
+                results.append({"order_id": order_id, "result": "error", "error": str(e)})
+                continue
+            update = {"$currentDate": {"modified_date": True}}
+            if fields:
+                update["$set"] = {**fields, **search_updates(fields)}
+            requests.append(UpdateOne({"order_id": order_id}, update))
+            request_ids.append(order_id)
+
+        errors = await _run_bulk(requests)
+        added, removed = [], []
+        for index, order_id in enumerate(request_ids):
+            if index in errors:
+                results.append({"order_id": order_id, "result": "error", "error": errors[index]})
+                continue
+            results.append({"order_id": order_id, "result": "updated"})
+            removed.append(existing[order_id])
+            added.append({**existing[order_id], **validated[order_id]})
+        await apply_rollup_changes(added=added, removed=removed)
+    return _in_order(results, updates)
+
+
+async def bulk_delete_orders(order_ids):
+    """Delete the listed orders with one unordered bulk_write per chunk. Returns one result per order."""
+    results = []
+    for chunk in _chunks(list(dict.fromkeys(order_ids))):
+        existing = await _existing_orders(chunk)
+
+        request_ids = [order_id for order_id in chunk if order_id in existing]
+        results.extend({"order_id": order_id, "result": "not_found"} for order_id in chunk if order_id not in existing)
+        errors = await _run_bulk([DeleteOne({"order_id": order_id}) for order_id in request_ids])
+
+        removed = []
+        for index, order_id in enumerate(request_ids):
+            if index in errors:
+                results.append({"order_id": order_id, "result": "error", "error": errors[index]})
+                continue
+            results.append({"order_id": order_id, "result": "deleted"})
+            removed.append(existing[order_id])
+        await apply_rollup_changes(removed=removed)
+        await record_tombstones([order["order_id"] for order in removed])
+    return _in_order(results, order_ids)
+
+
+async def order_ids_matching(query):
+    """Resolve a filter to the order_ids it matches."""
+    cursor = order_collection.find(query, {"order_id": 1, "_id": 0}).batch_size(BULK_CHUNK_SIZE)
+    return [order["order_id"] async for order in cursor if order.get("order_id")]
+
+
+def summarize(results):
+    """Count results by outcome."""
+    summary = {}
+    for result in results:
+        summary[result["result"]] = summary.get(result["result"], 0) + 1
+    return summary
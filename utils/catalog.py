@@ -0,0 +1,186 @@
+import asyncio
+import bisect
+import os
+import time
+
+from pymongo.errors import OperationFailure
+
+from database import items_collection
+from utils.logger import get_logger
+from utils.response_cache import collection_versions
+from utils.search import normalize
+
+logger = get_logger(__name__)
+
+# How long the cached catalog is served before it is reloaded (seconds)
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))
+
+# Backoff between attempts to re-open the items change stream after an error (seconds)
+CATALOG_WATCH_RETRY_SECONDS = 1.0
+CATALOG_WATCH_RETRY_MAX_SECONDS = 60.0
+
+# Server error codes: change streams unsupported (standalone server), resume point no longer in the oplog
+_CHANGE_STREAMS_UNSUPPORTED = 40573
+_CHANGE_STREAM_HISTORY_LOST = 286
+
+# Fields kept for each item; the same projection /orders/get_items has always returned
+CATALOG_PROJECTION = {"item_id": 1, "item_name": 1, "item_inventory": 1, "sku": 1, "price": 1, "_id": 0}
+
+
+class CatalogCache:
+    """
+    In-memory copy of the items collection, indexed by item_name and sku,
+    plus a sorted list of their normalized forms for prefix autocomplete.
+    Reloaded when older than `ttl`, on explicit invalidation, or when the
+    change stream reports a write to the items collection.
+    """
+
+    def __init__(self, ttl=CATALOG_TTL):
+        self.ttl = ttl
+        self.items = []
+        self.by_name = {}
+        self.by_sku = {}
+        self.completions = []
+        self.loaded_at = None
+        self._lock = asyncio.Lock()
+        self._watcher = None
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "invalidations": 0,
+                      "watch_restarts": 0}
+
+    def _is_fresh(self):
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl
+
+    async def refresh(self):
+        """Reload the whole catalog from MongoDB."""
+        items = await items_collection.find({}, CATALOG_PROJECTION).to_list(length=None)
+        self.items = items
+        self.by_name = {item["item_name"]: item for item in items if item.get("item_name")}
+        self.by_sku = {item["sku"]: item for item in items if item.get("sku")}
+        # (normalized name or SKU, position in items), sorted so a prefix is a contiguous range
+        self.completions = sorted(
+            (normalize(item[field]), position)
+            for position, item in enumerate(items)
+            for field in ("item_name", "sku") if item.get(field)
+        )
+        self.loaded_at = time.monotonic()
+        self.stats["refreshes"] += 1
+        # Responses built from the catalog (GET /orders/get_items) are stale from now on
+        collection_versions.bump(items_collection.name)
+
+    async def _ensure_fresh(self):
+        """Return True on a cache hit, reloading the catalog first when it is stale."""
+        if self._is_fresh():
+            return True
+        async with self._lock:
+            # Another request may have reloaded it while we waited for the lock
+            if not self._is_fresh():
+                await self.refresh()
+                return False
+        return True
+
+    def invalidate(self):
+        """Drop the cached catalog so the next read reloads it."""
+        self.loaded_at = None
+        self.stats["invalidations"] += 1
+
+    async def get_items(self):
+        """Return every catalog item."""
+        hit = await self._ensure_fresh()
+        self.stats["hits" if hit else "misses"] += 1
+        return self.items
+
+    async def get_by_name(self, item_name):
+        """Return the item with this name, falling back to MongoDB if it is not cached yet."""
+        hit = await self._ensure_fresh()
+        item = self.by_name.get(item_name)
+        if item is not None and hit:
+            self.stats["hits"] += 1
+            return item
+        self.stats["misses"] += 1
+        if item is None:
+            # The item may have been added since the last refresh
+            item = await items_collection.find_one({"item_name": item_name}, CATALOG_PROJECTION)
+        return item
+
+    async def get_by_sku(self, sku):
+        """Return the item with this SKU, falling back to MongoDB if it is not cached yet."""
+        hit = await self._ensure_fresh()
+        item = self.by_sku.get(sku)
+        if item is not None and hit:
+            self.stats["hits"] += 1
+            return item
+        self.stats["misses"] += 1
+        if item is None:
+            item = await items_collection.find_one({"sku": sku}, CATALOG_PROJECTION)
+        return item
+
+    async def autocomplete(self, prefix, limit=10):
+        """Items whose name or SKU starts with `prefix` (case- and accent-insensitive), in key order."""
+        hit = await self._ensure_fresh()
+        self.stats["hits" if hit else "misses"] += 1
+        key = normalize(prefix)
+        if not key:
+            return []
+        matches = []
+        seen = set()
+        start = bisect.bisect_left(self.completions, (key,))
+        for completion, position in self.completions[start:]:
+            if not completion.startswith(key) or len(matches) >= limit:
+                break
+            if position not in seen:
+                seen.add(position)
+                matches.append(self.items[position])
+        return matches
+
+    async def _watch(self):
+        """
+        Invalidate the cache on every write reported by the items change stream.
+        The stream is re-opened with backoff after an error (a step-down, a network blip), resuming
+        after the last change seen; the cache is dropped each time, as changes may have been missed.
+        """
+        resume_token = None
+        delay = CATALOG_WATCH_RETRY_SECONDS
+        while True:
+            try:
+                async with items_collection.watch(resume_after=resume_token) as stream:
+                    delay = CATALOG_WATCH_RETRY_SECONDS
+                    async for _ in stream:
+                        resume_token = stream.resume_token
+                        self.invalidate()
+            except OperationFailure as e:
+                if e.code == _CHANGE_STREAMS_UNSUPPORTED:
+                    # Change streams need a replica set; fall back to TTL and explicit invalidation
+                    logger.warning("Item catalog change stream unavailable, using TTL refresh only: %s", e)
+                    return
+                if e.code == _CHANGE_STREAM_HISTORY_LOST:
+                    resume_token = None
+                logger.warning("Item catalog change stream failed, retrying in %.0fs: %s", delay, e)
+            except Exception as e:
+                logger.warning("Item catalog change stream failed, retrying in %.0fs: %s", delay, e)
+            self.invalidate()
+            self.stats["watch_restarts"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, CATALOG_WATCH_RETRY_MAX_SECONDS)
+
+    def start_watching(self):
+        """Start the change-stream watcher on the running event loop."""
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["items"] = len(self.items)
+        stats["age_seconds"] = time.monotonic() - self.loaded_at if self.loaded_at is not None else None
+        stats["ttl_seconds"] = self.ttl
+        stats["change_stream"] = self._watcher is not None and not self._watcher.done()
+        return stats
+
+
+# Shared per-worker catalog cache
+catalog = CatalogCache()
@@ -0,0 +1,186 @@
+import csv
+import os
+from datetime import datetime, timezone, timedelta
+from io import StringIO
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from database import order_collection, tombstone_collection, sync_cursor_collection
+from utils.export_csv import EXPORT_BATCH_SIZE, EXPORT_COLUMNS, EXPORT_PROJECTION, order_to_row, format_export_date
+from utils.serializers import dumps
+
+router = APIRouter()
+
+# Changes stamped within this many seconds of the export are left for the next run, so writes that
+# were stamped by the app but not yet committed when the export started are not skipped
+DELTA_SAFETY_LAG_SECONDS = float(os.getenv("DELTA_SAFETY_LAG_SECONDS", "5"))
+
+# How long deletions are remembered; a sync that falls further behind must do a full export
+ORDER_TOMBSTONE_TTL_SECONDS = int(os.getenv("ORDER_TOMBSTONE_TTL_DAYS", "30")) * 86400
+
+
+async def record_tombstones(order_ids):
+    """Remember deleted orders so delta exports can report them."""
+    if not order_ids:
+        return
+    deleted_at = datetime.now(timezone.utc)
+    await tombstone_collection.insert_many(
+        [{"order_id": order_id, "deleted_at": deleted_at} for order_id in order_ids], ordered=False
+    )
+
+
+def next_watermark():
+    """Upper bound of an export starting now, truncated to the millisecond precision MongoDB stores."""
+    until = datetime.now(timezone.utc) - timedelta(seconds=DELTA_SAFETY_LAG_SECONDS)
+    return until.replace(microsecond=until.microsecond // 1000 * 1000)
+
+
+def changed_orders_query(since, until):
+    """
+    Orders created or modified in (since, until]. Each $or branch is served by its own index;
+    created_date is matched both as a datetime and as the ISO string create_order stores.
+    """
+    if since is None:
+        return {}
+    return {"$or": [
+        {"modified_date": {"$gt": since, "$lte": until}},
+        {"created_date": {"$gt": since, "$lte": until}},
+        {"created_date": {"$gt": since.isoformat(), "$lte": until.isoformat()}},
+    ]}
+
+
+async def iter_changes(since, until, batch_size):
+    """
+    Yield ("delete", tombstone) for orders deleted in the window, then ("upsert", order) for changed orders.
+    Deletions come first so an order deleted and re-created in the same window ends up present.
+    """
+    if since is not None:
+        tombstones = tombstone_collection.find(
+            {"deleted_at": {"$gt": since, "$lte": until}}, {"_id": 0}
+        ).sort("deleted_at", 1).batch_size(batch_size)
+        async for tombstone in tombstones:
+            yield "delete", tombstone
+
+    cursor = order_collection.find(changed_orders_query(since, until), EXPORT_PROJECTION).batch_size(batch_size)
+    async for order in cursor:
+        yield "upsert", order
+
+
+async def stream_delta_csv(since, until, batch_size):
+    """Yield the changes as CSV text chunks: a Change column followed by the regular export columns."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Change"] + [header for header, _ in EXPORT_COLUMNS])
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    rows_in_buffer = 0
+    async for change, document in iter_changes(since, until, batch_size):
+        if change == "delete":
+            # Tombstone rows carry the order ID and the deletion time in the Modified Date column
+            row = [""] * len(EXPORT_COLUMNS)
+            row[0] = document["order_id"]
+            row[-1] = format_export_date(document["deleted_at"])
+        else:
+            row = order_to_row(document)
+        writer.writerow([change] + row)
+        rows_in_buffer += 1
+        if rows_in_buffer >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            rows_in_buffer = 0
+
+    if rows_in_buffer:
+        yield buffer.getvalue()
+
+
+async def stream_delta_ndjson(since, until, batch_size):
+    """Yield the changes as NDJSON chunks, one {"change": ..., ...} object per line."""
+    lines = []
+    async for change, document in iter_changes(since, until, batch_size):
+        if change == "delete":
+            lines.append(dumps({"change": change, **document}))
+        else:
+            lines.append(dumps({"change": change, "order": document}))
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+async def get_sync_cursor(name):
+    """The watermark stored under `name`, or None when the consumer has never synced."""
+    cursor = await sync_cursor_collection.find_one({"_id": name})
+    if not cursor:
+        return None
+    watermark = cursor["watermark"]
+    # Stored datetimes come back naive (UTC)
+    return watermark.replace(tzinfo=timezone.utc) if watermark.tzinfo is None else watermark
+
+
+async def save_sync_cursor(name, watermark):
+    await sync_cursor_collection.update_one(
+        {"_id": name},
+        {"$set": {"watermark": watermark, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+async def advance_after(stream, name, watermark):
+    """Pass the stream through, storing the new watermark for `name` once it has been fully produced."""
+    async for chunk in stream:
+        yield chunk
+    await save_sync_cursor(name, watermark)
+
+
+@router.get("/export/delta", response_class=StreamingResponse)
+async def export_order_changes(
+    since: Optional[datetime] = None,
+    sync_cursor: Optional[str] = None,
+    format: str = "csv",
+    batch_size: int = EXPORT_BATCH_SIZE,
+):
+    """
+    Export only the orders created, modified or deleted after a watermark.
+    The watermark is `since`, or the one stored under `sync_cursor` (advanced once the stream completes);
+    without either, every order is exported. The next watermark is returned in X-Next-Watermark.
+    """
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    if batch_size < 1 or batch_size > 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+
+    try:
+        if since is None and sync_cursor:
+            since = await get_sync_cursor(sync_cursor)
+        if since is not None:
+            # Naive values are taken as UTC; offsets are converted so the ISO string comparison with the
+            # +00:00 created_date strings stored by create_order lines up
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            since = since.astimezone(timezone.utc)
+        until = next_watermark()
+
+        if format == "csv":
+            stream, media_type = stream_delta_csv(since, until, batch_size), "text/csv"
+        else:
+            stream, media_type = stream_delta_ndjson(since, until, batch_size), "application/x-ndjson"
+        if sync_cursor:
+            stream = advance_after(stream, sync_cursor, until)
+
+        return StreamingResponse(
+            stream,
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f"attachment; filename=orders_delta_{until.strftime('%Y%m%d_%H%M%S')}.{format}",
+                "X-Watermark": since.isoformat() if since else "",
+                "X-Next-Watermark": until.isoformat(),
+            },
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting order changes: {str(e)}")
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import re
+import time
+
+from pymongo import UpdateOne
+
+from database import employee_collection, register_collection
+from utils.logger import get_logger
+from utils.pagination import encode_cursor, decode_cursor, keyset_query
+from utils.response_cache import collection_versions
+from utils.search import normalize
+from utils.serializers import USER_LIST_PROJECTION, UNASSIGNED_USER_PROJECTION
+
+logger = get_logger(__name__)
+
+# How long a cached user listing page is served at most, as a backstop for writes made outside the app (seconds)
+DIRECTORY_CACHE_TTL = float(os.getenv("DIRECTORY_CACHE_TTL", "30"))
+
+# Upper bound on the number of distinct listing pages kept in the cache
+DIRECTORY_CACHE_MAX_ENTRIES = 1000
+
+# Page size limits for the user listing endpoints
+DIRECTORY_DEFAULT_LIMIT = 50
+DIRECTORY_MAX_LIMIT = 500
+
+# Listings are ordered by name, with _id as the keyset tie-breaker
+DIRECTORY_SORT = [("name", 1), ("_id", 1)]
+
+# Roles each session role is allowed to list
+VISIBLE_ROLES = {
+    "admin": ("manager", "employee"),
+    "manager": ("employee",),
+}
+
+# Users updated per bulk_write when backfilling the normalized search fields
+DIRECTORY_BACKFILL_BATCH_SIZE = 1000
+
+# Listing name -> (collection, projection, fields matched by the search term).
+# Each search field has a normalized copy under "search.<field>" for indexed prefix matching.
+LISTINGS = {
+    "staff": (employee_collection, USER_LIST_PROJECTION, ("name", "company_email", "email")),
+    "registered": (register_collection, UNASSIGNED_USER_PROJECTION, ("name", "email", "personal_email")),
+}
+
+
+def user_search_document(listing, user):
+    """The normalized "search" subdocument stored with a new user of the given listing."""
+    return {field: normalize(user.get(field)) for field in LISTINGS[listing][2]}
+
+
+class UserDirectory:
+    """
+    Paginated, searchable user listings backed by one `$in` query per role set.
+    Pages are cached for at most `ttl` seconds, keyed on the shared version of the listing's
+    collection, so a role change made by any worker process invalidates them (see utils.response_cache).
+    """
+
+    def __init__(self, ttl=DIRECTORY_CACHE_TTL):
+        self.ttl = ttl
+        self._cache = {}
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["pages"] = len(self._cache)
+        stats["ttl_seconds"] = self.ttl
+        return stats
+
+    async def list_users(self, listing, roles, search=None, cursor=None, limit=DIRECTORY_DEFAULT_LIMIT):
+        """
+        One page of users whose usertype is in `roles`, optionally filtered by a
+        case-insensitive name/email prefix. Returns {"users": [...], "next_cursor": token or None}.
+        Raises ValueError for an invalid cursor.
+        """
+        if not roles:
+            return {"users": [], "next_cursor": None}
+        limit = max(1, min(limit, DIRECTORY_MAX_LIMIT))
+        collection, projection, search_fields = LISTINGS[listing]
+        key = (listing, tuple(sorted(roles)), search or "", cursor or "", limit)
+        try:
+            versions = await collection_versions.shared_versions((collection.name,))
+        except Exception as e:
+            # Without the shared version freshness cannot be checked: answer uncached
+            logger.warning("Could not read collection versions: %s", e)
+            versions = None
+        cached = self._cache.get(key)
+        now = time.monotonic()
+        if cached and versions is not None:
+            if cached[1] == versions and now - cached[2] < self.ttl:
+                self.stats["hits"] += 1
+                return cached[0]
+            self.stats["stale"] += 1
+        self.stats["misses"] += 1
+
+        query = {"usertype": {"$in": list(roles)}}
+        prefix = normalize(search)
+        if prefix:
+            # Anchored, case-sensitive regex over the normalized copies: tight index bounds
+            pattern = {"$regex": "^" + re.escape(prefix)}
+            query["$or"] = [{f"search.{field}": pattern} for field in search_fields]
+        if cursor:
+            query = keyset_query(query, decode_cursor(cursor, "name", 1), "name", 1)
+
+        # Fetch one extra document to know whether another page follows
+        users = await collection.find(query, {**projection, "name": 1}).sort(DIRECTORY_SORT) \
+            .limit(limit + 1).to_list(length=limit + 1)
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = encode_cursor(users[-1], "name", 1)
+        # Only return the fields the listing has always returned
+        users = [{field: user[field] for field in projection if field in user} for user in users]
+        page = {"users": users, "next_cursor": next_cursor}
+
+        if versions is None:
+            return page
+        if len(self._cache) >= DIRECTORY_CACHE_MAX_ENTRIES:
+            self._cache.clear()
+        self._cache[key] = (page, versions, now)
+        return page
+
+
+# Shared instance used by the user routes
+directory = UserDirectory()
+
+
+async def backfill_user_search_fields(batch_size=DIRECTORY_BACKFILL_BATCH_SIZE):
+    """Add the normalized search fields to users written before they existed."""
+    updated = 0
+    for listing, (collection, _, search_fields) in LISTINGS.items():
+        projection = {field: 1 for field in search_fields}
+        cursor = collection.find({"search": {"$exists": False}}, projection).batch_size(batch_size)
+        requests = []
+        async for user in cursor:
+            requests.append(UpdateOne({"_id": user["_id"]},
+                                      {"$set": {"search": user_search_document(listing, user)}}))
+            if len(requests) >= batch_size:
+                await collection.bulk_write(requests, ordered=False)
+                updated += len(requests)
+                requests = []
+        if requests:
+            await collection.bulk_write(requests, ordered=False)
+            updated += len(requests)
+    logger.info("Backfilled search fields on %d users", updated)
+    return updated
+
+
+if __name__ == "__main__":
+    # Backfill command: python -m utils.directory
+    print(f"Backfilled search fields on {asyncio.run(backfill_user_search_fields())} users")
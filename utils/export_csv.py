@@ -1,3 +1,4 @@
+import os
 from fastapi import FastAPI, Response, HTTPException, APIRouter
 from fastapi.responses import StreamingResponse
 import csv
@@ -9,44 +10,93 @@ from database import order_collection
 
 router = APIRouter()
 
+# Number of orders pulled from the cursor (and written per CSV chunk) at a time
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# CSV header -> order field, in the order the columns are written
+EXPORT_COLUMNS = [
+    ("Order ID", "order_id"),
+    ("Customer Name", "customer_name"),
+    ("Customer Email", "customer_email"),
+    ("Item Name", "item_name"),
+    ("Price", "price"),
+    ("QTY", "qty"),
+    ("SKU", "sku"),
+    ("Managed By", "managed_by"),
+    ("Added By", "added_by"),
+    ("Status", "status"),
+    ("Created Date", "created_date"),
+    ("Modified Date", "modified_date"),
+]
+
+# Only fetch the exported columns from MongoDB
+EXPORT_PROJECTION = {field: 1 for _, field in EXPORT_COLUMNS}
+EXPORT_PROJECTION["_id"] = 0
+
+
+def format_export_date(value):
+    """Format a stored date (datetime or ISO string) the way the export has always written it."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return value
+    return ""
+
+
+def order_to_row(order):
+    """Convert an order document into a CSV row following EXPORT_COLUMNS."""
+    row = []
+    for _, field in EXPORT_COLUMNS:
+        if field in ("created_date", "modified_date"):
+            row.append(format_export_date(order.get(field)))
+        else:
+            row.append(order.get(field, ""))
+    return row
+
+
+async def stream_orders_csv(query=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield the orders export as CSV text chunks.
+    Rows are read from the cursor in batches of `batch_size` and each batch is
+    flushed as one chunk, so memory stays flat regardless of collection size.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    # Write the CSV header as the first chunk so the client gets bytes immediately
+    writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    cursor = order_collection.find(query or {}, EXPORT_PROJECTION).batch_size(batch_size)
+    rows_in_buffer = 0
+    async for order in cursor:
+        writer.writerow(order_to_row(order))
+        rows_in_buffer += 1
+        if rows_in_buffer >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            rows_in_buffer = 0
+
+    # Flush whatever is left from the last partial batch
+    if rows_in_buffer:
+        yield buffer.getvalue()
+
 
 @router.get("/export", response_class=StreamingResponse)
-async def export_orders():
+async def export_orders(batch_size: int = EXPORT_BATCH_SIZE):
+    if batch_size < 1 or batch_size > 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+
     try:
-        # Fetch all orders from MongoDB
-        orders = await order_collection.find().to_list(length=None)
-
-        # Create a StringIO object to write CSV data
-        csv_file = StringIO()
-        writer = csv.writer(csv_file)
-
-        # Write the CSV header
-        writer.writerow(["Order ID", "Customer Name", "Customer Email", "Item Name", "Price", "QTY", "SKU",
-                         "Managed By", "Added By", "Status", "Created Date", "Modified Date"])
-
-        # Write the rows from the MongoDB data
-        for order in orders:
-            writer.writerow([
-                order.get("order_id", ""),
-                order.get("customer_name", ""),
-                order.get("customer_email", ""),
-                order.get("item_name", ""),
-                order.get("price", ""),
-                order.get("qty", ""),
-                order.get("sku", ""),
-                order.get("managed_by", ""),
-                order.get("added_by", ""),
-                order.get("status", ""),
-                order.get("created_date", "").strftime("%Y-%m-%d %H:%M:%S") if "created_date" in order else "",
-                order.get("modified_date", "").strftime("%Y-%m-%d %H:%M:%S") if "modified_date" in order else ""
-            ])
-
-        # Reset the file pointer to the beginning
-        csv_file.seek(0)
-
-        # Return the CSV file as a response
+        # Stream the CSV straight from the MongoDB cursor
         return StreamingResponse(
-            csv_file,
+            stream_orders_csv(batch_size=batch_size),
             media_type="text/csv",
             headers={
                 "Content-Disposition": f"attachment; filename=orders_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
@@ -1,29 +1,59 @@
 
+import asyncio
 import string
 import random
-import smtplib
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from database import order_collection
-from fpdf import FPDF
+from pymongo.errors import DuplicateKeyError
 
 from models.orders import Order
-
-
-async def generate_short_order_id():
-    """Generate a unique short order ID."""
-    while True:
-        prefix = "ORD"
-        random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        short_id = f"{prefix}-{random_suffix}"
-
-        # Check if this ID already exists
-        existing_order = await order_collection.find_one({"order_id": short_id})
-        if not existing_order:
-            return short_id
+from utils.indexes import index_failures
+from utils.invoices import render_invoice_pdf
+from utils.mailer import mailer
+
+
+# How many freshly generated IDs are tried before giving up on inserting an order
+ORDER_ID_MAX_ATTEMPTS = 5
+
+_order_id_random = random.SystemRandom()
+
+
+def generate_short_order_id():
+    """Generate a short order ID. Uniqueness is enforced by the unique index on order_id (see utils.indexes)."""
+    prefix = "ORD"
+    random_suffix = ''.join(_order_id_random.choices(string.ascii_uppercase + string.digits, k=6))
+    return f"{prefix}-{random_suffix}"
+
+
+async def insert_order(order_data, regenerate_id=True):
+    """
+    Insert an order in a single round trip, relying on the unique order_id index.
+    When the ID was generated by us and collides, a new one is generated and the insert retried;
+    a caller-supplied ID that collides raises DuplicateKeyError.
+    While the unique index is missing (see utils.indexes.index_failures) the ID is checked
+    before the insert instead; that check is not atomic, but it keeps out plain collisions.
+    """
+    for attempt in range(ORDER_ID_MAX_ATTEMPTS):
+        if "orders.order_id_unique" in index_failures and \
+                await order_collection.find_one({"order_id": order_data["order_id"]}, {"_id": 1}):
+            if not regenerate_id:
+                raise DuplicateKeyError(f"Order ID {order_data['order_id']} already exists", 11000,
+                                        {"keyPattern": {"order_id": 1}})
+            order_data["order_id"] = generate_short_order_id()
+            continue
+        try:
+            await order_collection.insert_one(order_data)
+            return order_data["order_id"]
+        except DuplicateKeyError as e:
+            if not regenerate_id or "order_id" not in (e.details or {}).get("keyPattern", {}):
+                raise
+            order_data.pop("_id", None)  # insert_one assigned an _id to the dict
+            order_data["order_id"] = generate_short_order_id()
+    raise RuntimeError(f"Could not allocate a unique order ID after {ORDER_ID_MAX_ATTEMPTS} attempts")
 
 
 from datetime import datetime
@@ -56,10 +86,10 @@ def serialize_user(user):
         user["_id"] = str(user["_id"])
     return user
 
-async def send_email(order: Order, pdf_path: str):
-    sender_email = "prerakp87@gmail.com"
+def build_invoice_message(order: Order, pdf_data: bytes):
+    """Build the invoice email with the PDF attached."""
+    sender_email = mailer.sender
     receiver_email = order.customer_email  # Access model attribute
-    password =   # Replace with your App Password
 
     message = MIMEMultipart()
     message["From"] = sender_email
@@ -69,31 +99,44 @@ async def send_email(order: Order, pdf_path: str):
     body = "Please find your invoice attached."
     message.attach(MIMEText(body, "plain"))
 
-    with open(pdf_path, "rb") as attachment:
-        part = MIMEBase("application", "octet-stream")
-        part.set_payload(attachment.read())
-        encoders.encode_base64(part)
-        part.add_header(
-            "Content-Disposition",
-            f"attachment; filename= {order.order_id}.pdf",  # Access model attribute
-        )
-        message.attach(part)
+    part = MIMEBase("application", "octet-stream")
+    part.set_payload(pdf_data)
+    encoders.encode_base64(part)
+    part.add_header(
+        "Content-Disposition",
+        f"attachment; filename= {order.order_id}.pdf",  # Access model attribute
+    )
+    message.attach(part)
+
+    return message
+
 
-    with smtplib.SMTP("smtp.gmail.com", 587) as server:
-        server.starttls()
-        server.login(sender_email, password)
-        server.sendmail(sender_email, receiver_email, message.as_string())
+async def send_email(order: Order, pdf_data: bytes):
+    """Send the invoice email through the pooled mailer without blocking the event loop."""
+    message = await asyncio.to_thread(build_invoice_message, order, pdf_data)
+    await mailer.send(message)
 
 
 def generate_invoice_pdf(order):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt="Invoice", ln=True, align="C")
-    pdf.cell(200, 10, txt=f"Order ID: {order['order_id']}", ln=True)
-    pdf.cell(200, 10, txt=f"Customer Name: {order['customer_name']}", ln=True)
-    pdf.cell(200, 10, txt=f"Customer Email: {order['customer_email']}", ln=True)
-    pdf.cell(200, 10, txt=f"Item Name: {order['item_name']}", ln=True)
-    pdf.cell(200, 10, txt=f"Quantity: {order['qty']}", ln=True)
-    pdf.output(f"./invoices/{order['order_id']}.pdf")
-    return f"./invoices/{order['order_id']}.pdf"
+    """Render the order's invoice on the calling thread using the cached invoice template, returning the PDF bytes."""
+    return render_invoice_pdf(order)
+
+
+def created_date_range(date_from=None, date_to=None):
+    """
+    Build a query clause matching orders created within [date_from, date_to].
+    created_date is stored either as a datetime or as an ISO string depending on how
+    the order was written, so both representations are matched.
+    """
+    if not date_from and not date_to:
+        return {}
+
+    as_datetime = {}
+    as_string = {}
+    if date_from:
+        as_datetime["$gte"] = date_from
+        as_string["$gte"] = date_from.isoformat()
+    if date_to:
+        as_datetime["$lte"] = date_to
+        as_string["$lte"] = date_to.isoformat()
+    return {"$or": [{"created_date": as_datetime}, {"created_date": as_string}]}
@@ -1,64 +1,58 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from database import order_collection
-from models.orders import Order
-import csv
-from io import StringIO
-import openpyxl
+from fastapi.responses import JSONResponse
+
+from utils.imports import stage_upload
+from utils.jobs import enqueue_import_job, resume_job, get_job
 
 router = APIRouter()
 
+
 @router.post("/upload_csv")
 async def upload_file(file: UploadFile = File(...)):
     """
-    Upload and validate a file (CSV or XLSX), then insert valid rows into the database.
-    For CSV files, we read and decode the content.
-    For XLSX files, we use the file-like object provided by FastAPI.
+    Stage an uploaded file (CSV or XLSX) and queue its import, returning the job ID straight away.
+    Rows are validated in batches across a process pool and upserted by order_id in the background;
+    progress is reported by GET /upload_csv/{job_id}.
     """
     if not (file.filename.endswith(".csv") or file.filename.endswith(".xlsx")):
         raise HTTPException(status_code=400, detail="Only .csv and .xlsx files are allowed")
 
-    valid_orders = []
-    invalid_orders = []
-
-    if file.filename.endswith(".csv"):
-        # Read the whole file content as bytes, decode to string, and process with csv.DictReader.
-        content = await file.read()  # This returns bytes.
-        decoded_content = content.decode("utf-8")
-        csv_reader = csv.DictReader(StringIO(decoded_content))
-
-        for row in csv_reader:
-            try:
-                order = Order(**row)
-                valid_orders.append(order.model_dump())
-            except Exception as e:
-                invalid_orders.append({"row": row, "error": str(e)})
-
-    elif file.filename.endswith(".xlsx"):
-        # Instead of reading the bytes and wrapping in BytesIO,
-        # use the file-like object directly. Ensure the pointer is at the start.
-        file.file.seek(0)
-        workbook = openpyxl.load_workbook(file.file)
-        sheet = workbook.active
+    file.file.seek(0)
+    path, digest = await asyncio.to_thread(stage_upload, file.file, file.filename)
+    job_id = await enqueue_import_job(path, digest, file.filename)
+    return JSONResponse(status_code=202, content={"message": "Import queued", "job_id": str(job_id)})
 
-        # Get headers from the first row.
-        headers = [cell.value for cell in sheet[1]]
-
-        # Process each subsequent row.
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            row_data = dict(zip(headers, row))
-            try:
-                order = Order(**row_data)
-                valid_orders.append(order.model_dump())
-            except Exception as e:
-                invalid_orders.append({"row": row_data, "error": str(e)})
-
-    # Insert valid orders into the database.
-    if valid_orders:
-        await order_collection.insert_many(valid_orders)
 
+@router.get("/upload_csv/{job_id}")
+async def import_progress(job_id: str):
+    """Report the progress of an import job: rows processed, rows per second, errors and completion."""
+    job = await get_job(job_id)
+    if not job or job["type"] != "import":
+        raise HTTPException(status_code=404, detail="Job not found")
+    progress = job.get("progress") or {}
     return {
-        "message": "File processed successfully",
-        "valid_orders_count": len(valid_orders),
-        "invalid_orders_count": len(invalid_orders),
-        "invalid_orders": invalid_orders,
+        "job_id": job_id,
+        "filename": job["payload"].get("filename"),
+        "state": job["state"],
+        "completed": progress.get("completed", False),
+        "rows_processed": progress.get("rows_processed", 0),
+        "valid_orders_count": progress.get("valid", 0),
+        "invalid_orders_count": progress.get("invalid", 0),
+        "invalid_orders": progress.get("errors", []),
+        "rows_per_second": progress.get("rows_per_second"),
+        "elapsed_seconds": progress.get("elapsed_seconds"),
+        "attempts": job["attempts"],
+        "last_error": job.get("last_error"),
     }
+
+
+@router.post("/upload_csv/{job_id}/resume")
+async def resume_import(job_id: str):
+    """Queue a failed import again; it continues after the last checkpointed batch."""
+    job = await get_job(job_id)
+    if not job or job["type"] != "import":
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await resume_job(job_id):
+        raise HTTPException(status_code=409, detail=f"Only failed imports can be resumed (job is {job['state']})")
+    return {"message": "Import resumed", "job_id": job_id}
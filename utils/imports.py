@@ -0,0 +1,267 @@
+import asyncio
+import base64
+import csv
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import openpyxl
+from pymongo import UpdateOne
+
+from database import jobs_collection, order_collection
+from models.orders import Order
+from utils.analytics import apply_rollup_changes, clear_rollup_markers, rollup_fields
+from utils.logger import get_logger, log_fields
+from utils.metrics import span_latency, timed_span
+from utils.search import search_updates
+
+logger = get_logger(__name__)
+
+# Directory uploaded files are staged in until their import job has finished
+IMPORT_DIR = os.getenv("IMPORT_DIR", "./imports")
+
+# Rows validated per process-pool task and written per bulk_write (one checkpoint per batch)
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+# Number of processes validating rows, and how many batches are validated ahead of the writer
+IMPORT_VALIDATION_WORKERS = int(os.getenv("IMPORT_VALIDATION_WORKERS", str(os.cpu_count() or 1)))
+IMPORT_IN_FLIGHT = int(os.getenv("IMPORT_IN_FLIGHT", str(IMPORT_VALIDATION_WORKERS * 2)))
+
+# Maximum number of invalid rows recorded on the job; the rest are only counted
+IMPORT_MAX_INVALID_REPORTED = int(os.getenv("IMPORT_MAX_INVALID_REPORTED", "100"))
+
+_executor = None
+
+
+def get_executor(workers: int = IMPORT_VALIDATION_WORKERS):
+    """Return the shared validation process pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def shutdown_executor():
+    """Stop the validation process pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def stage_upload(source, filename):
+    """
+    Copy an uploaded file into IMPORT_DIR, returning (path, sha256 of the content).
+    The digest makes re-uploads of the same file map to the same job and the same order IDs.
+    """
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    extension = os.path.splitext(filename)[1].lower()
+    temp_path = os.path.join(IMPORT_DIR, f"upload-{os.getpid()}-{time.monotonic_ns()}{extension}.tmp")
+    digest = hashlib.sha256()
+    with open(temp_path, "wb") as f:
+        while chunk := source.read(1024 * 1024):
+            digest.update(chunk)
+            f.write(chunk)
+    path = os.path.join(IMPORT_DIR, f"{digest.hexdigest()}{extension}")
+    os.replace(temp_path, path)
+    return path, digest.hexdigest()
+
+
+def iter_csv_rows(path):
+    """Parse the CSV incrementally, yielding one dict per row."""
+    with open(path, encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def iter_xlsx_rows(path):
+    """Stream rows from the active sheet using openpyxl's read-only mode."""
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            return
+        for row in rows:
+            yield dict(zip(headers, row))
+    finally:
+        workbook.close()
+
+
+def iter_rows(path):
+    return iter_xlsx_rows(path) if path.endswith(".xlsx") else iter_csv_rows(path)
+
+
+def read_batch(rows, size):
+    """Take up to `size` rows from the iterator (run in a thread, file reads block)."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def validate_rows(rows, first_row_number):
+    """
+    Validate a batch of rows against the Order model inside a worker process.
+    Returns (orders as (row number, fields), invalid rows as (row number, row, error), seconds spent).
+    """
+    started = time.perf_counter()
+    orders = []
+    invalid = []
+    for offset, row in enumerate(rows):
+        row_number = first_row_number + offset
+        try:
+            orders.append((row_number, Order(**row).model_dump()))
+        except Exception as e:
+            invalid.append((row_number, row, str(e)))
+    return orders, invalid, time.perf_counter() - started
+
+
+def derived_order_id(file_digest, row_number):
+    """Deterministic order ID for a row without one, so re-importing the file updates rather than duplicates."""
+    digest = hashlib.sha256(f"{file_digest}:{row_number}".encode()).digest()
+    return "ORD-" + base64.b32encode(digest).decode()[:10]
+
+
+async def plan_batch(orders, file_digest):
+    """
+    Build the upserts for a batch of validated orders, keyed by order_id, and the rollup changes they make.
+    Columns left empty in the file (None) are not written, so a sparse re-import keeps existing values.
+    Returns (requests, rollup changes as {"added": [...], "removed": [...]}).
+    """
+    by_id = {}
+    for row_number, order in orders:
+        order["order_id"] = order.get("order_id") or derived_order_id(file_digest, row_number)
+        by_id[order["order_id"]] = order  # A later row with the same order_id wins
+
+    # The pre-image: rows that replace an existing order count as removing its previous version
+    existing = {
+        order["order_id"]: order
+        async for order in order_collection.find({"order_id": {"$in": list(by_id)}}, {"_id": 0})
+    }
+    now = datetime.now(timezone.utc)
+    requests = []
+    added = []
+    for order_id, order in by_id.items():
+        fields = {key: value for key, value in order.items()
+                  if key not in ("created_date", "modified_date") and value is not None}
+        update = {"$set": fields, "$currentDate": {"modified_date": True}}
+        if order.get("created_date"):
+            fields["created_date"] = order["created_date"]
+        else:
+            update["$setOnInsert"] = {"created_date": now}
+        requests.append(UpdateOne({"order_id": order_id}, update, upsert=True))
+        added.append(rollup_fields({**existing.get(order_id, {"created_date": now}), **fields}))
+        fields.update(search_updates(fields))
+
+    rollups = {"added": added, "removed": [rollup_fields(order) for order in existing.values()]}
+    return requests, rollups
+
+
+async def write_orders(requests, rollups, batch_key):
+    """
+    Run a batch's upserts with one unordered bulk_write and apply its rollup changes.
+    The whole step can be replayed: the upserts are idempotent, the rollup changes come from the
+    pre-image checkpointed before the first write, and `batch_key` (job id, first row) keeps the
+    rollups from counting the same batch twice.
+    """
+    with timed_span("csv_insert_batch"):
+        await order_collection.bulk_write(requests, ordered=False)
+    await apply_rollup_changes(**rollups, once=batch_key)
+
+
+async def _checkpoint(job, progress, elapsed_before, attempt_started):
+    """Persist the progress of the rows written so far; a resumed job skips them."""
+    progress["elapsed_seconds"] = elapsed_before + time.monotonic() - attempt_started
+    progress["rows_per_second"] = round(progress["rows_processed"] / progress["elapsed_seconds"], 1) \
+        if progress["elapsed_seconds"] else None
+    # Refresh the lock as well so a long import is not reclaimed while it is still running
+    await jobs_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"progress": progress, "locked_at": datetime.now(timezone.utc)}},
+    )
+
+
+async def process_import_job(job):
+    """
+    Validate the staged file in batches across the process pool and upsert the valid orders in order,
+    checkpointing after every batch. A retried or reclaimed job resumes after the last checkpoint.
+    """
+    payload = job["payload"]
+    progress = job.get("progress") or {
+        "rows_processed": 0, "valid": 0, "invalid": 0, "errors": [], "elapsed_seconds": 0.0,
+        "rows_per_second": None, "completed": False,
+    }
+    # Time spent by earlier attempts, so rows_per_second covers the whole import
+    elapsed_before = progress["elapsed_seconds"]
+    attempt_started = time.monotonic()
+    resume_from = progress["rows_processed"]
+    if resume_from:
+        logger.info("Resuming import", extra=log_fields(job_id=str(job["_id"]), rows_processed=resume_from))
+
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    rows = iter_rows(payload["path"])
+    # Skip the rows committed by a previous attempt
+    skipped = 0
+    while skipped < resume_from:
+        count = len(await asyncio.to_thread(read_batch, rows, min(IMPORT_BATCH_SIZE, resume_from - skipped)))
+        if not count:
+            break
+        skipped += count
+
+    # Batches are validated in parallel but written strictly in file order, so the checkpoint
+    # (rows_processed) always marks a prefix of the file that is fully written
+    pending = deque()
+    next_row = resume_from
+    exhausted = False
+    while not exhausted or pending:
+        while not exhausted and len(pending) < IMPORT_IN_FLIGHT:
+            batch = await asyncio.to_thread(read_batch, rows, IMPORT_BATCH_SIZE)
+            if not batch:
+                exhausted = True
+                break
+            # Row numbers are 1-based data rows (the header is not counted)
+            pending.append((next_row, len(batch), loop.run_in_executor(executor, validate_rows, batch, next_row + 1)))
+            next_row += len(batch)
+        if not pending:
+            break
+
+        first_row, batch_size, future = pending.popleft()
+        orders, invalid, validate_seconds = await future
+        span_latency.observe(validate_seconds, "csv_parse")
+        if orders:
+            requests, rollups = await plan_batch(orders, payload["digest"])
+            written = progress.get("batch_in_progress")
+            if written and written["first_row"] == first_row:
+                # An earlier attempt failed partway through this batch: reuse the rollup changes it recorded
+                rollups = written["rollups"]
+            else:
+                progress["batch_in_progress"] = {"first_row": first_row, "rollups": rollups}
+                await _checkpoint(job, progress, elapsed_before, attempt_started)
+            await write_orders(requests, rollups, (f"import_{job['_id']}", first_row))
+
+        progress["batch_in_progress"] = None
+        progress["rows_processed"] += batch_size
+        progress["valid"] += len(orders)
+        progress["invalid"] += len(invalid)
+        for row_number, row, error in invalid:
+            if len(progress["errors"]) >= IMPORT_MAX_INVALID_REPORTED:
+                break
+            # Keys are stringified: extra CSV columns and blank XLSX headers come back as None
+            progress["errors"].append({"row_number": row_number, "row": {str(k): v for k, v in row.items()},
+                                       "error": error})
+        await _checkpoint(job, progress, elapsed_before, attempt_started)
+
+    progress["completed"] = True
+    await _checkpoint(job, progress, elapsed_before, attempt_started)
+    await clear_rollup_markers(f"import_{job['_id']}")
+    # The staged copy is only needed to resume; drop it once the import has finished
+    try:
+        os.remove(payload["path"])
+    except OSError:
+        pass
@@ -0,0 +1,203 @@
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+
+from database import db
+from utils.delta_export import ORDER_TOMBSTONE_TTL_SECONDS
+from utils.directory import LISTINGS
+from utils.search import SEARCH_FIELDS, SEARCH_TEXT_WEIGHTS
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Collection name -> indexes that must exist on it. Applied on startup by apply_indexes().
+INDEXES = {
+    "orders": [
+        # Only string IDs are constrained, so legacy/imported orders without an order_id don't collide
+        IndexModel([("order_id", ASCENDING)], name="order_id_unique", unique=True,
+                   partialFilterExpression={"order_id": {"$type": "string"}}),
+        # get_all_orders / list_orders: equality filters followed by the default created_date sort,
+        # with _id as the keyset pagination tie-breaker
+        IndexModel([("created_date", DESCENDING), ("_id", DESCENDING)], name="created_date_id"),
+        IndexModel([("status", ASCENDING), ("created_date", DESCENDING), ("_id", DESCENDING)],
+                   name="status_created_date_id"),
+        IndexModel([("managed_by", ASCENDING), ("created_date", DESCENDING), ("_id", DESCENDING)],
+                   name="managed_by_created_date_id"),
+        IndexModel([("status", ASCENDING), ("managed_by", ASCENDING), ("created_date", DESCENDING),
+                    ("_id", DESCENDING)], name="status_managed_by_created_date_id"),
+        # Delta export: range over modified_date (the created_date range uses created_date_id)
+        IndexModel([("modified_date", ASCENDING)], name="modified_date"),
+        # Order search: whole-word relevance search (no stemming, the fields are names and codes)...
+        IndexModel([(field, TEXT) for field in SEARCH_FIELDS], name="order_search_text",
+                   weights=SEARCH_TEXT_WEIGHTS, default_language="none"),
+        # ...and as-you-type prefix search over the normalized copies
+        *[IndexModel([(f"search.{field}", ASCENDING)], name=f"search_{field}") for field in SEARCH_FIELDS],
+    ],
+    "items": [
+        IndexModel([("item_name", ASCENDING)], name="item_name"),
+        IndexModel([("sku", ASCENDING)], name="sku"),
+    ],
+    "employees": [
+        IndexModel([("company_email", ASCENDING)], name="company_email"),
+        IndexModel([("email", ASCENDING)], name="email"),
+        # User directory listings: usertype $in, ordered by name with _id as the keyset tie-breaker
+        IndexModel([("usertype", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)], name="usertype_name_id"),
+        # Directory search: prefix match over the normalized copies
+        *[IndexModel([(f"search.{field}", ASCENDING)], name=f"search_{field}") for field in LISTINGS["staff"][2]],
+    ],
+    "registered_users": [
+        IndexModel([("email", ASCENDING)], name="email"),
+        IndexModel([("usertype", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)], name="usertype_name_id"),
+        *[IndexModel([(f"search.{field}", ASCENDING)], name=f"search_{field}") for field in LISTINGS["registered"][2]],
+    ],
+    "jobs": [
+        # Job claims: each worker pool polls for the due jobs of its own types
+        IndexModel([("type", ASCENDING), ("state", ASCENDING), ("run_at", ASCENDING)], name="type_state_run_at"),
+        # Duplicate upload detection for import jobs
+        IndexModel([("payload.digest", ASCENDING)], name="payload_digest", sparse=True),
+    ],
+    "order_tombstones": [
+        # Delta export range; also expires tombstones older than the retention period
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl", expireAfterSeconds=ORDER_TOMBSTONE_TTL_SECONDS),
+    ],
+    "order_rollups": [
+        IndexModel([("kind", ASCENDING), ("key", DESCENDING)], name="kind_key"),
+    ],
+}
+
+# Representative queries issued by the routes, explained by the admin index report
+ROUTE_QUERIES = [
+    {"route": "POST /orders/create_order (order_id)", "collection": "orders",
+     "filter": {"order_id": "ORD-XXXXXX"}},
+    {"route": "POST /orders/create_order (item price)", "collection": "items",
+     "filter": {"item_name": "item"}},
+    {"route": "PUT|DELETE /orders/{id}", "collection": "orders",
+     "filter": {"order_id": "ORD-XXXXXX"}},
+    {"route": "GET /orders/get_all_orders", "collection": "orders",
+     "filter": {}, "sort": [("created_date", -1)]},
+    {"route": "GET /orders/get_all_orders?status", "collection": "orders",
+     "filter": {"status": "Pending"}, "sort": [("created_date", -1)]},
+    {"route": "GET /orders/list_orders?managed_by", "collection": "orders",
+     "filter": {"managed_by": "manager"}, "sort": [("created_date", -1)]},
+    {"route": "GET /orders/list_orders?status&managed_by", "collection": "orders",
+     "filter": {"status": "Pending", "managed_by": "manager"}, "sort": [("created_date", -1)]},
+    {"route": "GET /orders/list_orders?pagination=cursor", "collection": "orders",
+     "filter": {"status": "Pending", "$or": [{"created_date": {"$lt": "9999"}},
+                                             {"created_date": "9999", "_id": {"$lt": ObjectId()}}]},
+     "sort": [("created_date", -1), ("_id", -1)]},
+    {"route": "GET /export/delta (modified)", "collection": "orders",
+     "filter": {"modified_date": {"$gt": "2000-01-01", "$lte": "9999"}}},
+    {"route": "GET /export/delta (tombstones)", "collection": "order_tombstones",
+     "filter": {"deleted_at": {"$gt": "2000-01-01", "$lte": "9999"}}, "sort": [("deleted_at", 1)]},
+    {"route": "GET /orders/search?mode=prefix", "collection": "orders",
+     "filter": {"search.customer_name": {"$regex": "^smi"}}, "sort": [("search.customer_name", 1)]},
+    {"route": "POST /login", "collection": "employees",
+     "filter": {"company_email": "user@example.com"}},
+    {"route": "POST /signup", "collection": "employees",
+     "filter": {"email": "user@example.com"}},
+    {"route": "POST /assign_role", "collection": "registered_users",
+     "filter": {"email": "user@example.com"}},
+    {"route": "POST /show_user", "collection": "employees",
+     "filter": {"usertype": {"$in": ["manager", "employee"]}}, "sort": [("name", 1), ("_id", 1)]},
+    {"route": "POST /unassigned_user", "collection": "registered_users",
+     "filter": {"usertype": "visitor"}, "sort": [("name", 1), ("_id", 1)]},
+    {"route": "POST /show_user?search", "collection": "employees",
+     "filter": {"usertype": {"$in": ["manager", "employee"]},
+                "$or": [{f"search.{field}": {"$regex": "^smi"}} for field in LISTINGS["staff"][2]]},
+     "sort": [("name", 1), ("_id", 1)]},
+]
+
+
+# "collection.index name" -> error of the indexes the last apply_indexes() could not create
+index_failures = {}
+
+# "collection.index name" of the unique indexes; the application relies on these for correctness
+UNIQUE_INDEXES = {
+    f"{name}.{index.document['name']}"
+    for name, indexes in INDEXES.items() for index in indexes if index.document.get("unique")
+}
+
+
+def missing_unique_indexes():
+    """The unique indexes the last apply_indexes() could not create, so their uniqueness is not enforced."""
+    return sorted(key for key in index_failures if key in UNIQUE_INDEXES)
+
+
+async def apply_indexes(collections=None):
+    """
+    Create every registered index (optionally only for the given collection names).
+    Indexes are created one at a time, so one that cannot be built (e.g. a unique index over
+    duplicate data) does not keep the others on the same collection from being created.
+    Returns the failures, which are also kept in index_failures for the admin index report.
+    """
+    for name, indexes in INDEXES.items():
+        if collections and name not in collections:
+            continue
+        for index in indexes:
+            key = f"{name}.{index.document['name']}"
+            try:
+                await db[name].create_indexes([index])
+                index_failures.pop(key, None)
+            except Exception as e:
+                # An existing index with different options or duplicate data must not stop the app
+                index_failures[key] = str(e)
+                if key in UNIQUE_INDEXES:
+                    logger.critical("Could not create unique index %s, /readyz reports unavailable: %s", key, e)
+                else:
+                    logger.error("Could not create index %s: %s", key, e)
+    return dict(index_failures)
+
+
+def _plan_stages(plan):
+    """Flatten the stage names of a (winning) query plan tree."""
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return [stage for stage in stages if stage]
+
+
+def _index_names(plan):
+    """Collect the index names used by a query plan tree."""
+    names = [plan["indexName"]] if "indexName" in plan else []
+    if "inputStage" in plan:
+        names.extend(_index_names(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        names.extend(_index_names(child))
+    return names
+
+
+async def explain_route_queries():
+    """Explain each registered route query and flag the ones that fall back to a collection scan."""
+    report = []
+    for entry in ROUTE_QUERIES:
+        cursor = db[entry["collection"]].find(entry["filter"])
+        if entry.get("sort"):
+            cursor = cursor.sort(entry["sort"])
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        # Newer servers wrap the classic plan in queryPlan
+        winning_plan = winning_plan.get("queryPlan", winning_plan)
+        stages = _plan_stages(winning_plan)
+        report.append({
+            "route": entry["route"],
+            "collection": entry["collection"],
+            "stages": stages,
+            "indexes": _index_names(winning_plan),
+            "collscan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+        })
+    return report
+
+
+async def index_usage_stats():
+    """Return $indexStats access counters for every registered collection."""
+    stats = {}
+    for name in INDEXES:
+        rows = await db[name].aggregate([{"$indexStats": {}}]).to_list(length=None)
+        stats[name] = [
+            {"name": row["name"], "key": row["key"], "ops": row["accesses"]["ops"],
+             "since": row["accesses"]["since"].isoformat()}
+            for row in rows
+        ]
+    return stats
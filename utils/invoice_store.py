@@ -0,0 +1,166 @@
+import asyncio
+import os
+import re
+import uuid
+
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+import database
+from utils.invoices import invoice_digest, render_invoice
+
+# Storage backend for rendered invoices: "local" (sharded directory) or "gridfs"
+INVOICE_STORE = os.getenv("INVOICE_STORE", "local")
+
+# Root directory of the local backend; invoices are stored as <root>/ab/cd/<digest>.pdf
+INVOICE_DIR = os.getenv("INVOICE_DIR", "./invoices")
+
+# GridFS bucket used by the gridfs backend
+INVOICE_GRIDFS_BUCKET = os.getenv("INVOICE_GRIDFS_BUCKET", "invoices")
+
+# Size of the chunks streamed from GridFS
+INVOICE_STREAM_CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class LocalInvoiceStore:
+    """Invoices stored on disk under their digest, sharded two levels deep to keep directories small."""
+
+    def __init__(self, root=INVOICE_DIR):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.pdf")
+
+    async def exists(self, digest):
+        return await asyncio.to_thread(os.path.exists, self.path(digest))
+
+    async def missing(self, digests):
+        """The subset of `digests` that has not been stored yet."""
+        return await asyncio.to_thread(lambda: {d for d in digests if not os.path.exists(self.path(d))})
+
+    def _write(self, digest, data):
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary name and rename, so readers never see a partial file
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    async def put(self, digest, data):
+        await asyncio.to_thread(self._write, digest, data)
+
+    async def get_bytes(self, digest):
+        def read():
+            with open(self.path(digest), "rb") as f:
+                return f.read()
+        return await asyncio.to_thread(read)
+
+    async def response(self, digest, headers, filename, range_header=None):
+        # FileResponse reads the Range/If-Range request headers itself and streams the file from disk
+        return FileResponse(self.path(digest), media_type="application/pdf", filename=filename, headers=headers)
+
+
+class GridFSInvoiceStore:
+    """Invoices stored in a GridFS bucket, one file per digest (the digest is the filename)."""
+
+    def __init__(self, bucket_name=INVOICE_GRIDFS_BUCKET):
+        self.bucket_name = bucket_name
+
+    def _bucket(self):
+        # Resolved per call: the client is owned by the app lifespan
+        return AsyncIOMotorGridFSBucket(database.get_database(), bucket_name=self.bucket_name)
+
+    def _files(self):
+        return database.db[f"{self.bucket_name}.files"]
+
+    async def exists(self, digest):
+        return await self._files().find_one({"filename": digest}, {"_id": 1}) is not None
+
+    async def missing(self, digests):
+        cursor = self._files().find({"filename": {"$in": list(digests)}}, {"filename": 1, "_id": 0})
+        stored = {doc["filename"] async for doc in cursor}
+        return set(digests) - stored
+
+    async def put(self, digest, data):
+        await self._bucket().upload_from_stream(digest, data, metadata={"contentType": "application/pdf"})
+
+    async def get_bytes(self, digest):
+        grid_out = await self._bucket().open_download_stream_by_name(digest)
+        return await grid_out.read()
+
+    async def response(self, digest, headers, filename, range_header=None):
+        grid_out = await self._bucket().open_download_stream_by_name(digest)
+        size = grid_out.length
+        headers = {**headers, "Accept-Ranges": "bytes", "Content-Disposition": f'attachment; filename="{filename}"'}
+
+        byte_range = parse_range(range_header, size)
+        if byte_range == "invalid":
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        status_code = 200
+        start, end = 0, size
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        headers["Content-Length"] = str(end - start)
+
+        async def body():
+            grid_out.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = await grid_out.read(min(INVOICE_STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+        return StreamingResponse(body(), status_code=status_code, media_type="application/pdf", headers=headers)
+
+
+def parse_range(header, size):
+    """
+    Parse a single "bytes=start-end" range into (start, end_exclusive).
+    Returns None to serve the whole file (no header, or multiple ranges) and "invalid" when unsatisfiable.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size
+    else:
+        start = int(first)
+        end = min(size, int(last) + 1) if last else size
+    if start >= size or start >= end:
+        return "invalid"
+    return start, end
+
+
+def get_invoice_store():
+    """The configured invoice store backend."""
+    return GridFSInvoiceStore() if INVOICE_STORE == "gridfs" else LocalInvoiceStore()
+
+
+# Shared store used by the invoice jobs and the download endpoint
+invoice_store = get_invoice_store()
+
+
+async def ensure_invoice(order):
+    """
+    Return (digest, pdf bytes or None) for the order's invoice, rendering and storing it
+    only when no invoice with the same digest has been stored yet (bytes are None when reused).
+    """
+    digest = invoice_digest(order)
+    if await invoice_store.exists(digest):
+        return digest, None
+    pdf_data = await render_invoice(order)
+    await invoice_store.put(digest, pdf_data)
+    return digest, pdf_data
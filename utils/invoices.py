@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from fpdf import FPDF
+
+# Number of processes rendering invoices in parallel
+INVOICE_RENDER_WORKERS = int(os.getenv("INVOICE_RENDER_WORKERS", str(os.cpu_count() or 1)))
+
+# Layout shared by every invoice: (label, order field)
+INVOICE_LINES = [
+    ("Order ID", "order_id"),
+    ("Customer Name", "customer_name"),
+    ("Customer Email", "customer_email"),
+    ("Item Name", "item_name"),
+    ("Quantity", "qty"),
+]
+
+# Part of every invoice digest; bump it when the layout changes so stored invoices are re-rendered
+INVOICE_TEMPLATE_VERSION = "1"
+
+_template = None
+_executor = None
+
+
+def _build_template():
+    """Prepare a document with the page, font and header already laid out, pickled for cheap cloning."""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt="Invoice", ln=True, align="C")
+    return pickle.dumps(pdf)
+
+
+def invoice_digest(order):
+    """
+    SHA-256 of everything that appears on the order's invoice.
+    Orders whose invoice fields are unchanged keep the same digest, so their stored PDF is reused.
+    """
+    fields = [INVOICE_TEMPLATE_VERSION] + [str(order.get(field)) for _, field in INVOICE_LINES]
+    return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+
+def render_invoice_pdf(order):
+    """Render one invoice from the cached template, returning the PDF bytes."""
+    global _template
+    if _template is None:
+        _template = _build_template()
+
+    pdf = pickle.loads(_template)
+    for label, field in INVOICE_LINES:
+        pdf.cell(200, 10, txt=f"{label}: {order[field]}", ln=True)
+
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _render_many(orders):
+    """Render a chunk of invoices inside a worker process, returning (order_id, pdf bytes, error) per order."""
+    results = []
+    for order in orders:
+        try:
+            results.append((order["order_id"], render_invoice_pdf(order), None))
+        except Exception as e:
+            results.append((order.get("order_id"), None, str(e)))
+    return results
+
+
+def _init_worker():
+    """Build the template once when a render process starts."""
+    global _template
+    _template = _build_template()
+
+
+def get_executor(workers: int = INVOICE_RENDER_WORKERS):
+    """Return the shared render process pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    return _executor
+
+
+def shutdown_executor():
+    """Stop the render process pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def render_invoice(order):
+    """Render one invoice in the process pool without blocking the event loop."""
+    results = await render_invoices([order])
+    order_id, pdf_data, error = results[0]
+    if error:
+        raise RuntimeError(f"Failed to render invoice for {order_id}: {error}")
+    return pdf_data
+
+
+async def render_invoices(orders, executor=None):
+    """Render a list of invoices as one task in the process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or get_executor(), _render_many, orders)
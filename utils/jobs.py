@@ -0,0 +1,343 @@
+import asyncio
+import os
+from datetime import datetime, timezone, timedelta
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from database import jobs_collection, order_collection
+from models.orders import Order
+from utils.helpers import send_email, created_date_range
+from utils.invoices import render_invoices, invoice_digest, INVOICE_LINES, INVOICE_RENDER_WORKERS
+from utils.invoice_store import invoice_store, ensure_invoice
+from utils.imports import process_import_job
+from utils.logger import get_logger, log_fields
+from utils.metrics import timed_span
+
+logger = get_logger(__name__)
+
+# Number of concurrent workers running per-order invoice jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Number of workers running long batch jobs (imports, bulk invoice rendering). They have their own
+# pool so a few long imports never hold up the invoices of newly written orders.
+JOB_BATCH_WORKERS = int(os.getenv("JOB_BATCH_WORKERS", "1"))
+
+# How long an idle worker waits before polling the queue again (seconds)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+# A running job whose lock is older than this is considered abandoned and picked up again (seconds)
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", "300"))
+
+# Retry policy: attempt n waits JOB_RETRY_BASE_SECONDS * 2 ** (n - 1), capped at JOB_RETRY_MAX_SECONDS
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+
+# Orders sent to a render process per task, and how many tasks a bulk job keeps in flight
+INVOICE_BULK_CHUNK_SIZE = int(os.getenv("INVOICE_BULK_CHUNK_SIZE", "50"))
+INVOICE_BULK_IN_FLIGHT = int(os.getenv("INVOICE_BULK_IN_FLIGHT", str(INVOICE_RENDER_WORKERS * 2)))
+
+_workers = []
+
+
+async def process_invoice_job(job):
+    """Render the invoice PDF for the job's order and email it to the customer."""
+    order_id = job["payload"]["order_id"]
+    order = await order_collection.find_one({"order_id": order_id}, {"_id": 0})
+    if not order:
+        raise ValueError(f"Order {order_id} not found")
+
+    await order_collection.update_one({"order_id": order_id}, {"$set": {"invoice_status": "processing"}})
+
+    # FPDF rendering is CPU-bound, run it in the render process pool; unchanged invoices are reused from the store
+    with timed_span("invoice_render"):
+        digest, pdf_data = await ensure_invoice(order)
+    if pdf_data is None:
+        pdf_data = await invoice_store.get_bytes(digest)
+    with timed_span("email_send"):
+        await send_email(Order(**order), pdf_data)
+
+    await order_collection.update_one(
+        {"order_id": order_id},
+        {"$set": {"invoice_status": "sent", "invoice_digest": digest}, "$unset": {"invoice_error": ""}},
+    )
+
+
+def bulk_invoice_query(payload):
+    """Rebuild the order query of a bulk invoice job from its stored filter."""
+    query = {}
+    if payload.get("status"):
+        query["status"] = payload["status"]
+    if payload.get("managed_by"):
+        query["managed_by"] = payload["managed_by"]
+    query.update(created_date_range(payload.get("date_from"), payload.get("date_to")))
+    return query
+
+
+async def process_bulk_invoice_job(job):
+    """
+    Render the invoices of every order matching the job's filter in parallel, recording progress.
+    Orders whose invoice is already stored under the same digest are counted as cached and not re-rendered.
+    """
+    query = bulk_invoice_query(job["payload"])
+    total = await order_collection.count_documents(query)
+    progress = {"total": total, "rendered": 0, "cached": 0, "failed": 0, "errors": []}
+    await jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"progress": progress}})
+
+    async def render_missing(orders):
+        """Render the orders whose invoice digest is not in the store yet, and store the results."""
+        digests = {order["order_id"]: invoice_digest(order) for order in orders}
+        missing = await invoice_store.missing(set(digests.values()))
+        to_render = [order for order in orders if digests[order["order_id"]] in missing]
+        progress["cached"] += len(orders) - len(to_render)
+        results = await render_invoices(to_render) if to_render else []
+        stored = []
+        for order_id, pdf_data, error in results:
+            if not error:
+                try:
+                    await invoice_store.put(digests[order_id], pdf_data)
+                except Exception as e:
+                    error = f"Failed to store invoice: {e}"
+            stored.append((order_id, error))
+        return stored
+
+    async def record(results):
+        for order_id, error in results:
+            if error:
+                progress["failed"] += 1
+                if len(progress["errors"]) < 20:
+                    progress["errors"].append({"order_id": order_id, "error": error})
+            else:
+                progress["rendered"] += 1
+        # Refresh the lock as well so a long bulk job is not reclaimed while it is still running
+        await jobs_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"progress": progress, "locked_at": datetime.now(timezone.utc)}},
+        )
+
+    projection = {field: 1 for _, field in INVOICE_LINES}
+    projection["_id"] = 0
+    cursor = order_collection.find(query, projection).batch_size(INVOICE_BULK_CHUNK_SIZE)
+
+    pending = set()
+    chunk = []
+    try:
+        async for order in cursor:
+            chunk.append(order)
+            if len(chunk) < INVOICE_BULK_CHUNK_SIZE:
+                continue
+            pending.add(asyncio.ensure_future(render_missing(chunk)))
+            chunk = []
+            # Keep a bounded number of chunks in flight so the cursor is not drained into memory
+            if len(pending) >= INVOICE_BULK_IN_FLIGHT:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    await record(task.result())
+
+        if chunk:
+            pending.add(asyncio.ensure_future(render_missing(chunk)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                await record(task.result())
+    finally:
+        # After a failure, stop the chunks still in flight rather than leave them running unobserved
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+# Job type -> coroutine that performs it
+JOB_HANDLERS = {
+    "invoice": process_invoice_job,
+    "bulk_invoice": process_bulk_invoice_job,
+    "import": process_import_job,
+}
+
+# Worker pool -> (job types it runs, number of workers)
+JOB_POOLS = {
+    "invoice": (("invoice",), JOB_WORKERS),
+    "batch": (("bulk_invoice", "import"), JOB_BATCH_WORKERS),
+}
+
+# One wake-up event per pool, so an enqueue only wakes the workers that can run the job
+_wakeups = {pool: asyncio.Event() for pool in JOB_POOLS}
+
+
+def _wake(job_type):
+    for pool, (job_types, _) in JOB_POOLS.items():
+        if job_type in job_types:
+            _wakeups[pool].set()
+
+
+async def _on_job_failed(job, error):
+    """Reflect a failed attempt on the order the job belongs to."""
+    if job["type"] == "invoice":
+        status = "retrying" if job["state"] == "queued" else "failed"
+        await order_collection.update_one(
+            {"order_id": job["payload"]["order_id"]},
+            {"$set": {"invoice_status": status, "invoice_error": error}},
+        )
+
+
+async def enqueue_job(job_type: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS):
+    """Persist a new job in the queue and wake up an idle worker."""
+    now = datetime.now(timezone.utc)
+    job = {
+        "type": job_type,
+        "payload": payload,
+        "state": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": now,
+        "locked_at": None,
+        "last_error": None,
+        "created_date": now,
+        "modified_date": now,
+    }
+    result = await jobs_collection.insert_one(job)
+    _wake(job_type)
+    return result.inserted_id
+
+
+async def enqueue_invoice_job(order_id: str):
+    """Queue invoice rendering and delivery for an order."""
+    return await enqueue_job("invoice", {"order_id": order_id})
+
+
+async def enqueue_bulk_invoice_job(status=None, managed_by=None, date_from=None, date_to=None):
+    """Queue rendering of every invoice matching the filter."""
+    payload = {"status": status, "managed_by": managed_by, "date_from": date_from, "date_to": date_to}
+    return await enqueue_job("bulk_invoice", payload, max_attempts=1)
+
+
+async def enqueue_import_job(path: str, digest: str, filename: str):
+    """
+    Queue the import of a staged upload. Uploading the same file again while its import
+    is still queued or running returns the existing job instead of starting a second one.
+    """
+    existing = await jobs_collection.find_one(
+        {"type": "import", "payload.digest": digest, "state": {"$in": ["queued", "running"]}}, {"_id": 1}
+    )
+    if existing:
+        return existing["_id"]
+    return await enqueue_job("import", {"path": path, "digest": digest, "filename": filename})
+
+
+async def resume_job(job_id: str):
+    """Queue a failed job again; it continues from its last checkpoint. Returns False if it is not failed."""
+    if not ObjectId.is_valid(job_id):
+        return False
+    now = datetime.now(timezone.utc)
+    job = await jobs_collection.find_one_and_update(
+        {"_id": ObjectId(job_id), "state": "failed"},
+        {"$set": {"state": "queued", "run_at": now, "attempts": 0, "modified_date": now}},
+        projection={"type": 1},
+    )
+    if job:
+        _wake(job["type"])
+    return job is not None
+
+
+async def get_job(job_id: str):
+    """Fetch a job by id, or None if it does not exist."""
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await jobs_collection.find_one({"_id": ObjectId(job_id)})
+
+
+async def claim_job(job_types=tuple(JOB_HANDLERS)):
+    """
+    Atomically take the next due job of the given types off the queue.
+    Jobs left in the running state by a crashed worker are reclaimed once their lock expires.
+    """
+    now = datetime.now(timezone.utc)
+    return await jobs_collection.find_one_and_update(
+        {
+            "type": {"$in": list(job_types)},
+            "$or": [
+                {"state": "queued", "run_at": {"$lte": now}},
+                {"state": "running", "locked_at": {"$lte": now - timedelta(seconds=JOB_LOCK_TIMEOUT)}},
+            ]
+        },
+        {"$set": {"state": "running", "locked_at": now, "modified_date": now}, "$inc": {"attempts": 1}},
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff delay before the next attempt."""
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+
+
+async def run_job(job):
+    """Execute a claimed job and record its outcome, rescheduling it with backoff on failure."""
+    now = datetime.now(timezone.utc)
+    try:
+        handler = JOB_HANDLERS[job["type"]]
+        await handler(job)
+    except Exception as e:
+        error = str(e)
+        if job["attempts"] < job["max_attempts"]:
+            job["state"] = "queued"
+            update = {"state": "queued", "run_at": now + timedelta(seconds=retry_delay(job["attempts"]))}
+        else:
+            job["state"] = "failed"
+            update = {"state": "failed"}
+        update.update({"locked_at": None, "last_error": error, "modified_date": now})
+        await jobs_collection.update_one({"_id": job["_id"]}, {"$set": update})
+        await _on_job_failed(job, error)
+        logger.warning("Job failed", extra=log_fields(job_id=str(job["_id"]), job_type=job["type"],
+                                                       attempt=job["attempts"], error=error))
+        return
+
+    await jobs_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"state": "done", "locked_at": None, "last_error": None, "modified_date": now}},
+    )
+
+
+async def _worker_loop(pool):
+    """Keep claiming and running the jobs of `pool` until cancelled."""
+    job_types, _ = JOB_POOLS[pool]
+    wakeup = _wakeups[pool]
+    while True:
+        try:
+            job = await claim_job(job_types)
+        except Exception as e:
+            logger.error("Error claiming job: %s", e)
+            job = None
+
+        if job:
+            try:
+                await run_job(job)
+            except Exception as e:
+                # Recording the outcome failed; keep the worker alive, the job is reclaimed once its lock expires
+                logger.error("Error running job", extra=log_fields(job_id=str(job["_id"]), job_type=job["type"],
+                                                                    error=str(e)))
+            continue
+
+        # Nothing due: sleep until a new job is enqueued or the poll interval elapses
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers():
+    """Start the background worker pools on the running event loop."""
+    for pool, (_, count) in JOB_POOLS.items():
+        for _ in range(count):
+            _workers.append(asyncio.create_task(_worker_loop(pool)))
+        logger.info("Started %d %s job workers", count, pool)
+
+
+async def stop_workers():
+    """Cancel the worker pools; jobs that were running are reclaimed after JOB_LOCK_TIMEOUT."""
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,189 @@
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+
+# Default level for application loggers
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# Per-module levels, e.g. "routes.auth=WARNING,utils.jobs=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+
+# Share of DEBUG/INFO records kept for noisy loggers, e.g. "routes.auth=0.1"; warnings and errors are never sampled
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+# Request ID of the request being handled, attached to every record logged while serving it
+request_id_var = ContextVar("request_id", default=None)
+
+_listener = None
+
+
+def _parse_mapping(value, cast):
+    """Parse "name=value,name=value" into a dict."""
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, setting = item.split("=", 1)
+            mapping[name.strip()] = cast(setting.strip())
+    return mapping
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request ID and drop sampled-out low-level records."""
+
+    def __init__(self, sample_rates=None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+
+    def _sample_rate(self, name):
+        # The most specific configured prefix wins
+        rate = 1.0
+        matched = ""
+        for prefix, prefix_rate in self.sample_rates.items():
+            if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > len(matched):
+                rate, matched = prefix_rate, prefix
+        return rate
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING and self.sample_rates:
+            rate = self._sample_rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                return False
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    converter = time.gmtime
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback out of the message. The stock prepare() formats the
+    record with the traceback folded into msg; here the message is rendered on its own and the
+    traceback travels in exc_text, so the JSON formatter emits it as the separate "exc" field.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Traceback objects hold frames and must not outlive the call; keep the formatted text
+            record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging():
+    """
+    Route application and uvicorn logging through an in-memory queue.
+    Records are only enqueued on the request path; a background thread
+    (QueueListener) formats them as JSON lines and writes them to stdout.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter(_parse_mapping(LOG_SAMPLE_RATES, float)))
+
+    output_handler = logging.StreamHandler(sys.stdout)
+    output_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    # uvicorn configures its loggers with their own stdout handlers before the app is imported;
+    # those write and flush on the request path, so send their records through the queue instead
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    # httpx logs every outgoing request (reCAPTCHA verification) at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    for name, level in _parse_mapping(LOG_LEVELS, str.upper).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush the queue and stop the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name):
+    return logging.getLogger(name)
+
+
+def log_fields(**fields):
+    """Structured fields for a log call: logger.info("msg", extra=log_fields(order_id=...))."""
+    return {"fields": fields}
+
+
+class RequestIdMiddleware:
+    """ASGI middleware assigning each request an ID (or reusing X-Request-ID) for log correlation."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
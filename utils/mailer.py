@@ -0,0 +1,188 @@
+import asyncio
+import os
+import smtplib
+import time
+
+# SMTP server and account used for outgoing mail
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_SENDER = os.getenv("SMTP_SENDER", "prerakp87@gmail.com")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")  # App Password for the sender account; no login when empty
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"  # Disable for a local SMTP stand-in
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+# Number of long-lived SMTP connections and how many queued messages one connection sends per batch
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "20"))
+
+# Connections idle for longer than this are checked with NOOP before they are reused (seconds)
+SMTP_IDLE_CHECK = float(os.getenv("SMTP_IDLE_CHECK", "60"))
+
+
+def _connection_lost(error):
+    """True for errors that mean the SMTP session is gone, as opposed to a rejected message."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    return not isinstance(error, smtplib.SMTPException)  # Socket errors: timeouts, resets, refused connects
+
+
+class Mailer:
+    """
+    Pool of long-lived, authenticated SMTP connections.
+    Each connection is owned by one asyncio worker that drains up to `batch_size`
+    queued messages and sends them over the same session in a worker thread,
+    so TLS/auth handshakes are paid once per connection instead of once per email.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, sender=SMTP_SENDER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, pool_size=SMTP_POOL_SIZE, batch_size=SMTP_BATCH_SIZE,
+                 timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.starttls = starttls
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._queue = None
+        self._workers = []
+        self._started_at = None
+        self._stats = {
+            "messages_sent": 0,
+            "messages_failed": 0,
+            "batches": 0,
+            "connections_opened": 0,
+            "reconnects": 0,
+            "send_seconds_total": 0.0,
+        }
+
+    def _connect(self):
+        """Open and authenticate a new SMTP session (runs in a worker thread)."""
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.password:
+            server.login(self.sender, self.password)
+        self._stats["connections_opened"] += 1
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _is_alive(self, server, last_used):
+        """Check an idle connection with NOOP before reusing it."""
+        if time.monotonic() - last_used < SMTP_IDLE_CHECK:
+            return True
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _send_batch(self, server, last_used, batch):
+        """
+        Send a batch of messages over one connection (runs in a worker thread).
+        Returns the connection to keep for the next batch and one error (or None) per message.
+        """
+        errors = []
+        if server is not None and not self._is_alive(server, last_used):
+            self._close(server)
+            server = None
+            self._stats["reconnects"] += 1
+
+        for message in batch:
+            for attempt in range(2):
+                try:
+                    if server is None:
+                        server = self._connect()
+                    server.sendmail(self.sender, message["To"], message.as_string())
+                    errors.append(None)
+                    break
+                except OSError as e:  # SMTPException is an OSError subclass too
+                    if not _connection_lost(e):
+                        # Message-level rejection (refused recipient, 5xx reply), the connection is still usable
+                        errors.append(e)
+                        break
+                    # Connection dropped: reconnect once and retry the same message
+                    if server is not None:
+                        self._close(server)
+                    server = None
+                    if attempt == 0:
+                        self._stats["reconnects"] += 1
+                        continue
+                    errors.append(e)
+        return server, errors
+
+    async def _worker(self):
+        """Own one SMTP connection and send queued messages over it in batches."""
+        server = None
+        last_used = time.monotonic()
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                messages = [message for message, _ in batch]
+                started = time.perf_counter()
+                try:
+                    server, errors = await asyncio.to_thread(self._send_batch, server, last_used, messages)
+                except Exception as e:
+                    server, errors = None, [e] * len(messages)
+                last_used = time.monotonic()
+                self._stats["send_seconds_total"] += time.perf_counter() - started
+                self._stats["batches"] += 1
+
+                for (_, future), error in zip(batch, errors):
+                    if error is None:
+                        self._stats["messages_sent"] += 1
+                        if not future.done():
+                            future.set_result(None)
+                    else:
+                        self._stats["messages_failed"] += 1
+                        if not future.done():
+                            future.set_exception(error)
+        finally:
+            if server is not None:
+                await asyncio.to_thread(self._close, server)
+
+    def start(self):
+        """Start the connection workers on the running event loop."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._started_at = time.monotonic()
+        for _ in range(self.pool_size):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """Stop the workers and close their SMTP connections."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def send(self, message):
+        """Queue a message for delivery and wait until it has been accepted by the server."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, future))
+        await future
+
+    def stats(self):
+        """Delivery counters plus derived throughput figures."""
+        stats = dict(self._stats)
+        uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+        stats["queue_depth"] = self._queue.qsize() if self._queue else 0
+        stats["pool_size"] = self.pool_size
+        stats["avg_batch_size"] = stats["messages_sent"] / stats["batches"] if stats["batches"] else 0.0
+        stats["messages_per_second"] = stats["messages_sent"] / uptime if uptime else 0.0
+        return stats
+
+
+# Shared mailer used by the application
+mailer = Mailer()
@@ -0,0 +1,282 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# Latency buckets in seconds, shared by every histogram
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, with labels."""
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels, rendered in Prometheus format."""
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labels + ("le",), label_values + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_metrics():
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+http_errors = Counter("http_request_errors_total", "HTTP requests that failed with a 5xx or an exception.",
+                      ("method", "route"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+mongo_latency = Histogram("mongodb_command_duration_seconds", "MongoDB command latency.",
+                          ("collection", "command"))
+mongo_failures = Counter("mongodb_command_failures_total", "MongoDB commands that failed.",
+                         ("collection", "command"))
+mongo_pool_wait = Histogram("mongodb_pool_checkout_wait_seconds", "Time spent waiting to check out a pooled connection.",
+                            ("address",))
+mongo_pool_checkout_failures = Counter("mongodb_pool_checkout_failures_total",
+                                       "Connection checkouts that failed, by reason.", ("address", "reason"))
+span_latency = Histogram("span_duration_seconds", "Duration of instrumented code sections.", ("span",))
+
+
+@contextmanager
+def timed_span(name):
+    """Time a hot section inside a handler: with timed_span("invoice_render"): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span_latency.observe(time.perf_counter() - start, name)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Record the duration of every MongoDB command per collection and operation."""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        # The collection is the value of the command's first key (find: "orders"), or "collection" for getMore
+        target = event.command.get("collection") if event.command_name == "getMore" \
+            else event.command.get(event.command_name)
+        self._collections[event.request_id] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_latency.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_latency.observe(event.duration_micros / 1e6, collection, event.command_name)
+        mongo_failures.inc(collection, event.command_name)
+
+
+mongo_command_listener = MongoCommandListener()
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Track connection pool usage per server: open and checked-out connections, threads
+    waiting for a checkout, and checkout wait times (also exported as a histogram).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def _pool(self, address):
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {
+                "open": 0, "checked_out": 0, "waiting": 0, "max_waiting": 0, "checkouts": 0,
+                "checkout_failures": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "cleared": 0,
+            }
+        return key, pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)[1]["cleared"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(self._pool(event.address)[0], None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address)[1]["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)[1]
+            pool["open"] = max(0, pool["open"] - 1)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            pool = self._pool(event.address)[1]
+            pool["waiting"] += 1
+            pool["max_waiting"] = max(pool["max_waiting"], pool["waiting"])
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            key, pool = self._pool(event.address)
+            pool["waiting"] = max(0, pool["waiting"] - 1)
+            pool["checkout_failures"] += 1
+        mongo_pool_wait.observe(event.duration, key)
+        mongo_pool_checkout_failures.inc(key, str(event.reason))
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            key, pool = self._pool(event.address)
+            pool["waiting"] = max(0, pool["waiting"] - 1)
+            pool["checked_out"] += 1
+            pool["checkouts"] += 1
+            pool["wait_seconds_total"] += event.duration
+            pool["wait_seconds_max"] = max(pool["wait_seconds_max"], event.duration)
+        mongo_pool_wait.observe(event.duration, key)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)[1]
+            pool["checked_out"] = max(0, pool["checked_out"] - 1)
+
+    def stats(self):
+        """Snapshot of the per-server pool statistics, with the mean checkout wait."""
+        with self._lock:
+            snapshot = {key: dict(pool) for key, pool in self._pools.items()}
+        for pool in snapshot.values():
+            pool["wait_seconds_mean"] = pool["wait_seconds_total"] / pool["checkouts"] if pool["checkouts"] else 0.0
+        return snapshot
+
+
+mongo_pool_listener = PoolStatsListener()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, errors and latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            # FastAPI stores the matched route in the scope; use its template to keep cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, path, str(status[0]))
+            http_latency.observe(elapsed, method, path)
+            if status[0] >= 500:
+                http_errors.inc(method, path)
@@ -0,0 +1,127 @@
+import base64
+import os
+import time
+from datetime import datetime
+
+from bson import json_util, ObjectId, Binary, Timestamp, Regex
+
+# How long a cached total count stays valid (seconds)
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+
+# Upper bound on the number of distinct queries whose count is cached
+COUNT_CACHE_MAX_ENTRIES = 1000
+
+_count_cache = {}
+
+# BSON types in MongoDB's cross-type sort order, as $type aliases per bracket. Range operators only
+# match values of the same bracket, so a keyset filter also has to select the brackets sorted after it.
+# Null (and missing) sorts first and is matched by equality with None rather than by $type.
+SORT_TYPE_BRACKETS = [
+    None,
+    ["int", "long", "double", "decimal"],
+    ["string", "symbol"],
+    ["object"],
+    ["array"],
+    ["binData"],
+    ["objectId"],
+    ["bool"],
+    ["date"],
+    ["timestamp"],
+    ["regex"],
+]
+
+
+def sort_bracket(value):
+    """Index of the value's type in SORT_TYPE_BRACKETS."""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 7
+    if isinstance(value, (int, float)) or type(value).__name__ in ("Int64", "Decimal128"):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, (list, tuple)):
+        return 4
+    if isinstance(value, (bytes, Binary)):
+        return 5
+    if isinstance(value, ObjectId):
+        return 6
+    if isinstance(value, datetime):
+        return 8
+    if isinstance(value, Timestamp):
+        return 9
+    if isinstance(value, Regex):
+        return 10
+    raise ValueError(f"Cannot paginate on values of type {type(value).__name__}")
+
+
+def encode_cursor(document, sort_by, sort_order):
+    """Build an opaque continuation token from the last document of a page."""
+    payload = {"s": sort_by, "o": sort_order, "v": document.get(sort_by), "id": document["_id"]}
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode()
+
+
+def decode_cursor(token, sort_by, sort_order):
+    """Decode a continuation token, checking it was issued for the same sort."""
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort_by or payload.get("o") != sort_order:
+        raise ValueError("Cursor was issued for a different sort")
+    return payload
+
+
+def keyset_query(query, token_payload, sort_by, sort_order):
+    """
+    Extend a query so it resumes strictly after the (sort_by, _id) pair in the token.
+    _id breaks ties between documents sharing the same sort value. The sort field may hold values of
+    several types (created_date is an ISO string, a datetime or null depending on the write path), so
+    the documents of the type brackets sorted after the token's are selected as well.
+    """
+    op = "$lt" if sort_order == -1 else "$gt"
+    value = token_payload["v"]
+    last_id = token_payload["id"]
+    bracket = sort_bracket(value)
+    clauses = [{sort_by: value, "_id": {op: last_id}}]
+    if bracket:
+        # Null is the only value of its bracket, so only the tie-break applies to it
+        clauses.append({sort_by: {op: value}})
+
+    later = SORT_TYPE_BRACKETS[bracket + 1:] if sort_order == 1 else SORT_TYPE_BRACKETS[:bracket]
+    types = [alias for aliases in later if aliases for alias in aliases]
+    if types:
+        clauses.append({sort_by: {"$type": types}})
+    if sort_order == -1 and bracket:
+        clauses.append({sort_by: None})
+    after = {"$or": clauses}
+    return {"$and": [query, after]} if query else after
+
+
+async def count_orders(collection, query, mode):
+    """
+    Total number of documents matching the query according to the count mode:
+    exact (count_documents), estimated (collection metadata when unfiltered, otherwise cached),
+    cached (exact count reused for COUNT_CACHE_TTL seconds) or none.
+    """
+    if mode == "none":
+        return None
+    if mode == "exact":
+        return await collection.count_documents(query)
+    if mode == "estimated" and not query:
+        return await collection.estimated_document_count()
+
+    key = (collection.name, json_util.dumps(query, sort_keys=True))
+    cached = _count_cache.get(key)
+    now = time.monotonic()
+    if cached and now - cached[1] < COUNT_CACHE_TTL:
+        return cached[0]
+
+    total = await collection.count_documents(query)
+    if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+        _count_cache.clear()
+    _count_cache[key] = (total, now)
+    return total
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import httpx
+
+# Siteverify endpoint; point it at a local stub in tests and benchmarks
+RECAPTCHA_VERIFY_URL = os.getenv("RECAPTCHA_VERIFY_URL", "https://www.google.com/recaptcha/api/siteverify")
+RECAPTCHA_SECRET = os.getenv("RECAPTCHA_SECRET", "6LcDF-QqAAAAAA_5-gFeSPror9HT0V4LJKXc-DQ-")
+
+# Connect timeout, and the total budget of a verification: waiting for a concurrency slot plus the
+# whole upstream call. httpx applies its timeout to each phase separately, so the total is enforced
+# around the call as well (seconds)
+RECAPTCHA_CONNECT_TIMEOUT = float(os.getenv("RECAPTCHA_CONNECT_TIMEOUT", "2"))
+RECAPTCHA_TIMEOUT = float(os.getenv("RECAPTCHA_TIMEOUT", "5"))
+
+# Maximum verify calls in flight at once, and the size of the shared connection pool
+RECAPTCHA_MAX_CONCURRENCY = int(os.getenv("RECAPTCHA_MAX_CONCURRENCY", "20"))
+
+# How long a successfully verified token is remembered (seconds) and how many are kept
+RECAPTCHA_CACHE_TTL = float(os.getenv("RECAPTCHA_CACHE_TTL", "120"))
+RECAPTCHA_CACHE_MAX_ENTRIES = 10000
+
+
+class RecaptchaVerifier:
+    """
+    Verifies reCAPTCHA tokens over a shared, pooled async HTTP client.
+    Successful results are cached briefly and concurrent checks of the same
+    token share a single upstream call.
+    """
+
+    def __init__(self, verify_url=RECAPTCHA_VERIFY_URL, secret=RECAPTCHA_SECRET,
+                 max_concurrency=RECAPTCHA_MAX_CONCURRENCY, cache_ttl=RECAPTCHA_CACHE_TTL):
+        self.verify_url = verify_url
+        self.secret = secret
+        self.max_concurrency = max_concurrency
+        self.cache_ttl = cache_ttl
+        self._client = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache = {}
+        self._in_flight = {}
+        self.stats = {"verifications": 0, "cache_hits": 0, "shared_calls": 0, "upstream_calls": 0, "errors": 0,
+                      "timeouts": 0}
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(RECAPTCHA_TIMEOUT, connect=RECAPTCHA_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+        return self._client
+
+    async def close(self):
+        """Close the pooled HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry and time.monotonic() - entry[1] < self.cache_ttl:
+            return entry[0]
+        self._cache.pop(key, None)
+        return None
+
+    def _remember(self, key, result):
+        if len(self._cache) >= RECAPTCHA_CACHE_MAX_ENTRIES:
+            # Drop expired entries first, then everything if the cache is still full
+            now = time.monotonic()
+            self._cache = {k: v for k, v in self._cache.items() if now - v[1] < self.cache_ttl}
+            if len(self._cache) >= RECAPTCHA_CACHE_MAX_ENTRIES:
+                self._cache.clear()
+        self._cache[key] = (result, time.monotonic())
+
+    async def _call_upstream(self, token):
+        async with asyncio.timeout(RECAPTCHA_TIMEOUT):
+            async with self._semaphore:
+                self.stats["upstream_calls"] += 1
+                response = await self._get_client().post(
+                    self.verify_url,
+                    data={"secret": self.secret, "response": token},
+                )
+                response.raise_for_status()
+                return response.json()
+
+    async def verify(self, token):
+        """Return Google's siteverify result for the token."""
+        self.stats["verifications"] += 1
+        key = hashlib.sha256(token.encode()).hexdigest()
+
+        cached = self._cached(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+
+        # Share the upstream call with any concurrent verification of the same token
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_upstream(token))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats["shared_calls"] += 1
+        try:
+            result = await asyncio.shield(task)
+        except TimeoutError:
+            # Fail closed: a verification that cannot finish within the budget counts as failed
+            self.stats["timeouts"] += 1
+            return {"success": False, "error-codes": ["timeout"]}
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+
+        if result.get("success"):
+            self._remember(key, result)
+        return result
+
+
+# Shared verifier used by the /recaptcha endpoint
+verifier = RecaptchaVerifier()
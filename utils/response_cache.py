@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.responses import Response
+from pymongo import monitoring, UpdateOne
+
+from utils.logger import get_logger
+from utils.serializers import dumps
+
+logger = get_logger(__name__)
+
+# Entries are also dropped after this many seconds, as a backstop for writes made outside the app (seconds)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+
+# LRU bounds: number of cached responses and their total size
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Commands that change the documents of the collection they target
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify", "drop"}
+
+# Collection holding the shared version counters, one document per data collection
+VERSION_COLLECTION = "cache_versions"
+
+# How often each worker publishes writes made outside a request (job workers) to the shared counters
+# and re-reads the counters of every collection (seconds). Cached responses see another worker's
+# writes within 2 x this interval (3 x for job writes); this worker's own writes are seen at once.
+VERSION_FLUSH_INTERVAL = float(os.getenv("VERSION_FLUSH_INTERVAL", "1"))
+
+# A snapshot of the shared counters older than this is re-read inline before it is used (seconds)
+VERSION_MAX_AGE = 2 * VERSION_FLUSH_INTERVAL
+
+
+def _version_collection():
+    # Imported here: database imports this module to register the listener
+    from database import get_database
+    return get_database()[VERSION_COLLECTION]
+
+
+class CollectionVersionListener(monitoring.CommandListener):
+    """
+    Track a version per collection that changes on every write, so cached responses built from a
+    collection are invalidated by any write path in any worker process.
+
+    Each process counts its own writes locally (seen immediately) and publishes them to shared
+    counters in MongoDB: before the response of the request that wrote is sent (CacheVersionMiddleware),
+    and periodically for writes made by background jobs. The shared counters are read back into a
+    local snapshot every VERSION_FLUSH_INTERVAL, so checking a version needs no query.
+    A version is the (shared, local) pair.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._targets = {}
+        self._unpublished = set()
+        self._shared = {}
+        self._refreshed_at = None
+        self._flusher = None
+
+    def version(self, collection):
+        return self._versions.get(collection, 0)
+
+    def bump(self, collection):
+        with self._lock:
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+            self._unpublished.add(collection)
+
+    async def refresh(self):
+        """Re-read the shared counters of every collection into the local snapshot (one query)."""
+        refreshed_at = time.monotonic()
+        self._shared = {document["_id"]: document["v"] async for document in _version_collection().find()}
+        self._refreshed_at = refreshed_at
+
+    async def shared_versions(self, collections):
+        """
+        The (shared, local) version of each collection. Served from the snapshot, which is only
+        re-read here when the periodic refresh has fallen behind (or was never started).
+        """
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at > VERSION_MAX_AGE:
+            await self.refresh()
+        return tuple((self._shared.get(name, 0), self.version(name)) for name in collections)
+
+    async def publish(self):
+        """Increment the shared counters of the collections written since the last publish."""
+        with self._lock:
+            collections, self._unpublished = self._unpublished, set()
+        if not collections:
+            return
+        try:
+            await _version_collection().bulk_write(
+                [UpdateOne({"_id": name}, {"$inc": {"v": 1}}, upsert=True) for name in sorted(collections)],
+                ordered=False,
+            )
+        except Exception as e:
+            with self._lock:
+                self._unpublished |= collections
+            logger.warning("Could not publish collection versions: %s", e)
+
+    async def _flush_periodically(self):
+        while True:
+            await self.publish()
+            try:
+                await self.refresh()
+            except Exception as e:
+                # shared_versions() retries inline once the snapshot is too old
+                logger.warning("Could not refresh collection versions: %s", e)
+            await asyncio.sleep(VERSION_FLUSH_INTERVAL)
+
+    def start_flushing(self):
+        """Start publishing writes and refreshing the shared counters on the running event loop."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop_flushing(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.publish()
+
+    def started(self, event):
+        if event.command_name in WRITE_COMMANDS:
+            target = event.command.get(event.command_name)
+            if isinstance(target, str) and target != VERSION_COLLECTION:
+                self._targets[event.request_id] = target
+
+    def succeeded(self, event):
+        target = self._targets.pop(event.request_id, None)
+        if target:
+            self.bump(target)
+
+    def failed(self, event):
+        # A failed write may still have been partly applied (unordered bulk writes)
+        self.succeeded(event)
+
+
+collection_versions = CollectionVersionListener()
+
+
+class CacheVersionMiddleware:
+    """
+    ASGI middleware publishing the writes a request made before its response starts, so other
+    workers pick them up at their next snapshot refresh rather than after the next periodic publish.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_publish(message):
+            if message["type"] == "http.response.start":
+                await collection_versions.publish()
+            await send(message)
+
+        await self.app(scope, receive, send_after_publish)
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header matches the ETag (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    """
+    LRU cache of encoded JSON responses keyed by route and query parameters.
+    An entry is served while the versions of the collections it was built from are unchanged
+    and it is younger than `ttl`; a matching If-None-Match then gets a 304 without a database query.
+    Writes from other worker processes invalidate entries within 2 x VERSION_FLUSH_INTERVAL.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0}
+
+    @staticmethod
+    def key(request):
+        return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+    def _lookup(self, key, versions):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        body, etag, entry_versions, created = entry
+        if entry_versions != versions or time.monotonic() - created >= self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return body, etag
+
+    def _remove(self, key):
+        body = self._entries.pop(key)[0]
+        self._bytes -= len(body)
+
+    def _store(self, key, body, etag, versions):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (body, etag, versions, time.monotonic())
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _respond(self, request, body, etag):
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    async def respond(self, request, collections, load):
+        """
+        Serve the route's JSON response from the cache, or build it with `await load()` and cache it.
+        `collections` are the collection names the response is built from.
+        """
+        key = self.key(request)
+        # Read the versions before loading, so a write racing the query leaves the entry stale
+        try:
+            versions = await collection_versions.shared_versions(collections)  # No query while the snapshot is fresh
+        except Exception as e:
+            # Without the shared versions freshness cannot be checked: answer uncached
+            logger.warning("Could not read collection versions: %s", e)
+            return Response(dumps(await load()), media_type="application/json")
+        cached = self._lookup(key, versions)
+        if cached:
+            self.stats["hits"] += 1
+            return self._respond(request, *cached)
+
+        self.stats["misses"] += 1
+        body = dumps(await load())
+        # The ETag is derived from the body, so it is stable across restarts and worker processes
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self._store(key, body, etag, versions)
+        return self._respond(request, body, etag)
+
+    def invalidate(self):
+        """Drop every cached response."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["entries"] = len(self._entries)
+        stats["bytes"] = self._bytes
+        stats["ttl_seconds"] = self.ttl
+        return stats
+
+
+# Shared cache used by the polled list endpoints
+response_cache = ResponseCache()
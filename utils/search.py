@@ -0,0 +1,121 @@
+import asyncio
+import os
+import re
+import unicodedata
+
+from pymongo import UpdateOne
+
+from database import order_collection
+from utils.logger import get_logger
+from utils.serializers import ORDER_LIST_PROJECTION
+
+logger = get_logger(__name__)
+
+# Order fields covered by search; each gets a normalized copy under "search.<field>" for prefix matching.
+# The order is the prefix ranking: an SKU match ranks above an email match, and so on.
+SEARCH_FIELDS = ("sku", "customer_email", "customer_name", "item_name")
+
+# Relative weights of the fields in the text index
+SEARCH_TEXT_WEIGHTS = {"sku": 10, "customer_email": 8, "customer_name": 5, "item_name": 3}
+
+# Page size and depth limits; deep pages of a relevance ranking are rarely useful and cost a full sort
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_PAGE = int(os.getenv("SEARCH_MAX_PAGE", "20"))
+
+# Orders updated per bulk_write when backfilling the normalized fields
+SEARCH_BACKFILL_BATCH_SIZE = 1000
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(value):
+    """Case-fold, strip accents and collapse whitespace, so "  Zoë SMITH" and "zoe smith" compare equal."""
+    if value is None:
+        return None
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def search_updates(fields):
+    """$set entries keeping the normalized copies in step with the searchable fields being written."""
+    return {f"search.{field}": normalize(fields[field]) for field in SEARCH_FIELDS if field in fields}
+
+
+def search_document(order):
+    """The normalized "search" subdocument stored with a new order."""
+    return {field: normalize(order.get(field)) for field in SEARCH_FIELDS}
+
+
+def _filters(status=None, managed_by=None):
+    query = {}
+    if status:
+        query["status"] = status
+    if managed_by:
+        query["managed_by"] = managed_by
+    return query
+
+
+async def text_search(q, status=None, managed_by=None, page=1, limit=SEARCH_DEFAULT_LIMIT):
+    """Whole-word search over the text index, ranked by text score. Returns (orders, has_more)."""
+    query = {"$text": {"$search": q}, **_filters(status, managed_by)}
+    projection = {**ORDER_LIST_PROJECTION, "score": {"$meta": "textScore"}}
+    cursor = order_collection.find(query, projection) \
+        .sort([("score", {"$meta": "textScore"}), ("_id", -1)]) \
+        .skip((page - 1) * limit).limit(limit + 1)
+    orders = await cursor.to_list(length=limit + 1)
+    return orders[:limit], len(orders) > limit
+
+
+async def prefix_search(q, status=None, managed_by=None, page=1, limit=SEARCH_DEFAULT_LIMIT):
+    """
+    As-you-type search: orders where any searchable field starts with `q` (after normalization).
+    Each field is queried on its own index in index order, and the results are merged by field
+    priority (SEARCH_FIELDS), so no query needs an in-memory sort. Returns (orders, has_more).
+    """
+    prefix = normalize(q)
+    if not prefix:
+        return [], False
+    wanted = page * limit + 1
+    pattern = {"$regex": "^" + re.escape(prefix)}
+    filters = _filters(status, managed_by)
+
+    async def by_field(field):
+        cursor = order_collection.find({f"search.{field}": pattern, **filters}, ORDER_LIST_PROJECTION) \
+            .sort(f"search.{field}", 1).limit(wanted)
+        return await cursor.to_list(length=wanted)
+
+    ranked = []
+    seen = set()
+    for orders in await asyncio.gather(*(by_field(field) for field in SEARCH_FIELDS)):
+        for order in orders:
+            if order["_id"] not in seen:
+                seen.add(order["_id"])
+                ranked.append(order)
+    start = (page - 1) * limit
+    return ranked[start:start + limit], len(ranked) > start + limit
+
+
+async def backfill_search_fields(batch_size=SEARCH_BACKFILL_BATCH_SIZE):
+    """Add the normalized search fields to orders written before they existed."""
+    projection = {field: 1 for field in SEARCH_FIELDS}
+    cursor = order_collection.find({"search": {"$exists": False}}, projection).batch_size(batch_size)
+    requests = []
+    updated = 0
+    async for order in cursor:
+        requests.append(UpdateOne({"_id": order["_id"]}, {"$set": {"search": search_document(order)}}))
+        if len(requests) >= batch_size:
+            await order_collection.bulk_write(requests, ordered=False)
+            updated += len(requests)
+            requests = []
+    if requests:
+        await order_collection.bulk_write(requests, ordered=False)
+        updated += len(requests)
+    logger.info("Backfilled search fields on %d orders", updated)
+    return updated
+
+
+if __name__ == "__main__":
+    # Backfill command: python -m utils.search
+    print(f"Backfilled search fields on {asyncio.run(backfill_search_fields())} orders")
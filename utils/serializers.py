@@ -0,0 +1,41 @@
+import orjson
+from bson import ObjectId
+from fastapi.responses import Response
+
+# Fields returned by the order list endpoints
+ORDER_LIST_PROJECTION = {
+    "_id": 1, "order_id": 1, "customer_name": 1, "customer_email": 1, "item_name": 1, "price": 1,
+    "qty": 1, "sku": 1, "managed_by": 1, "added_by": 1, "status": 1, "created_date": 1,
+    "modified_date": 1, "invoice_status": 1,
+}
+
+# Fields returned by the user list endpoints
+USER_LIST_PROJECTION = {"_id": 1, "name": 1, "usertype": 1}
+UNASSIGNED_USER_PROJECTION = {"_id": 1, "email": 1, "usertype": 1}
+
+
+def _default(obj):
+    """Encode the BSON types orjson does not know natively."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content):
+    """
+    Encode raw MongoDB documents straight to JSON bytes.
+    datetimes are written in ISO format natively and ObjectIds as strings, so
+    documents need no per-field preprocessing before they are returned.
+    """
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered with orjson.
+    Returned directly from a route it also bypasses FastAPI's jsonable_encoder pass.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,71 @@
+import os
+import zlib
+
+from utils.serializers import dumps
+
+# Media types a client can ask for to get newline-delimited JSON instead of one JSON document
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson")
+
+# zlib level used when gzipping streamed responses; low levels keep up with the cursor at little size cost
+STREAM_GZIP_LEVEL = int(os.getenv("STREAM_GZIP_LEVEL", "5"))
+
+
+def _media_ranges(header):
+    """Parse an Accept or Accept-Encoding header into {value: q}."""
+    ranges = {}
+    for part in header.split(","):
+        value, *params = [piece.strip() for piece in part.split(";")]
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        ranges[value.lower()] = q
+    return ranges
+
+
+def wants_ndjson(request, format=None):
+    """True when the `format` query parameter or the Accept header asks for NDJSON."""
+    if format is not None:
+        return format == "ndjson"
+    ranges = _media_ranges(request.headers.get("accept", ""))
+    return any(ranges.get(media_type, 0) > 0 for media_type in NDJSON_MEDIA_TYPES)
+
+
+def accepts_gzip(request):
+    """True when Accept-Encoding allows gzip (explicitly or through *)."""
+    ranges = _media_ranges(request.headers.get("accept-encoding", ""))
+    return ranges.get("gzip", ranges.get("*", 0)) > 0
+
+
+async def stream_ndjson(cursor, batch_size):
+    """
+    Yield the cursor's documents as NDJSON, one chunk per batch of `batch_size` documents,
+    so memory stays bounded by a batch whatever the size of the result.
+    """
+    lines = []
+    async for document in cursor.batch_size(batch_size):
+        lines.append(dumps(document))
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+async def gzip_stream(chunks, level=STREAM_GZIP_LEVEL):
+    """
+    Gzip a byte stream on the fly. Each chunk is sync-flushed, so the client can decompress
+    and process every batch as it arrives rather than waiting for the end of the stream.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16+: gzip header and trailer
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()